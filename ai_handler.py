@@ -1,24 +1,122 @@
+import logging
 import os
+import re
 import json
-from openai import OpenAI
-from typing import List
-from config import OPENAI_API_KEY
+import functools
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+from typing import List, Optional
+from config import OPENAI_API_KEY, DUPLICATE_SIMILARITY_LOW, DUPLICATE_SIMILARITY_HIGH
+from llm_cache import LLMCache
 
-# Configure the OpenAI client with the new syntax
-client = OpenAI(api_key=OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
 
+# A single process-wide async OpenAI client. HTTP/2 multiplexes the concurrent requests over a few
+# connections; the read timeout stays at the SDK default because article processing can take minutes.
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=200),
+    timeout=httpx.Timeout(600.0, connect=5.0),
+    http2=True,
+)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=3)
+
+CHAT_MODEL = "gpt-5-mini-2025-08-07"
+# The ambiguous-duplicate check needs a single-token answer, which requires a non-reasoning model with logit_bias
+DUPLICATE_CHECK_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Keep embedding input well below the model's 8191-token limit; the lead of an article is enough to identify the story
+EMBEDDING_INPUT_CHARS = 8000
+
+# Results by content hash, so a retried or resumed article doesn't pay for the same requests again.
+# Embeddings are only kept in memory; they are stored with the article anyway.
+_processing_cache = LLMCache("processing")
+_embedding_cache = LLMCache("embedding", persist=False)
+_facebook_post_cache = LLMCache("facebook_post", maxsize=512)
+
+@functools.lru_cache(maxsize=32)
 def load_prompt(prompt_name: str) -> str:
-    """Load prompt from file in prompts/ directory."""
+    """Load prompt from file in prompts/ directory. Prompts are static, so each file is read only once."""
     prompt_path = os.path.join("prompts", f"{prompt_name}.txt")
     try:
         with open(prompt_path, 'r', encoding='utf-8') as f:
             return f.read().strip()
     except FileNotFoundError:
-        print(f"Warning: Prompt file {prompt_path} not found")
+        logger.warning("Prompt file %s not found", prompt_path)
         return ""
 
 
-def is_article_unique(new_article_content: str, existing_articles_content: List[str]) -> bool:
+# Pre-warm the prompt cache so the first article doesn't pay the file I/O
+for _prompt_name in (
+    "duplicate_check", "article_processing", "combined_response_format",
+    "facebook_post_generation"
+):
+    load_prompt(_prompt_name)
+
+
+# Boosts the single-token answers "U" (unique) and "D" (duplicate) of the duplicate check.
+# Token IDs in DUPLICATE_CHECK_MODEL's o200k_base encoding; they are fixed for the model,
+# so the tokenizer (a network download) isn't needed at runtime.
+DUPLICATE_CHECK_LOGIT_BIAS = {"52": 10, "35": 10}  # "U", "D"
+
+# Trailing whitespace and punctuation stripped from generated titles and descriptions
+_TRAILING_PUNCT = re.compile(r'[\s.,;:!?\-–—]+$')
+
+
+async def get_embedding(text: str) -> Optional[np.ndarray]:
+    """
+    Returns the embedding of the text quantized to int8 (1 byte per dimension),
+    or None if the request fails.
+    """
+    text = text[:EMBEDDING_INPUT_CHARS]
+    key = _embedding_cache.key(text)
+    cached = await _embedding_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        response = await client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=text,
+        )
+        vec = np.asarray(response.data[0].embedding, dtype=np.float32)
+        # Scale by the largest component so the full int8 range is used
+        embedding = np.round(vec / np.abs(vec).max() * 127).astype(np.int8)
+        await _embedding_cache.set(key, embedding)
+        return embedding
+    except Exception as e:
+        logger.error("❌ Error creating embedding with OpenAI: %s", e)
+        return None
+
+
+def classify_by_similarity(new_embedding: Optional[np.ndarray], existing_embeddings: np.ndarray) -> tuple[Optional[bool], Optional[int]]:
+    """
+    Compares an article's embedding with today's embeddings.
+    Returns the verdict - True if it is unique, False if it is a duplicate, or None if the LLM has to decide -
+    together with the row of existing_embeddings most similar to it (None if there is nothing to compare).
+    """
+    if new_embedding is None:
+        return None, None
+    if not existing_embeddings.size:
+        return True, None
+
+    # Accumulate the int8 dot products in int32: 1536 products of up to 127² overflow int16
+    existing = existing_embeddings.astype(np.int32)
+    new_vec = new_embedding.astype(np.int32)
+    norms = np.sqrt(np.einsum('ij,ij->i', existing, existing))
+    sims = existing @ new_vec / (norms * np.sqrt(new_vec @ new_vec))
+    best_match = int(sims.argmax())
+    max_similarity = float(sims[best_match])
+    logger.info("📐 Max similarity to today's articles: %.3f", max_similarity)
+
+    if max_similarity < DUPLICATE_SIMILARITY_LOW:
+        return True, best_match
+    if max_similarity >= DUPLICATE_SIMILARITY_HIGH:
+        return False, best_match
+    return None, best_match
+
+
+async def is_article_unique(new_article_content: str, existing_articles_content: List[str]) -> bool:
     """
     Uses OpenAI to determine if a new article is semantically unique compared to existing ones.
     """
@@ -33,100 +131,189 @@ def is_article_unique(new_article_content: str, existing_articles_content: List[
     user_content = f"НОВА СТАТТЯ:\n{new_article_content}\n\nІСНУЮЧІ СТАТТІ:\n{existing_content_block}"
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-5-mini-2025-08-07",
+        response = await client.chat.completions.create(
+            model=DUPLICATE_CHECK_MODEL,
             messages=[
                 {"role": "system", "content": prompt_template},
                 {"role": "user", "content": user_content}
             ],
+            max_tokens=1,
+            temperature=0,
+            logit_bias=DUPLICATE_CHECK_LOGIT_BIAS,
         )
-        answer = response.choices[0].message.content.strip().upper()
-        # Перевіряємо як англійську, так і українську відповідь
-        return "UNIQUE" in answer or "УНІКАЛЬНА" in answer
+        # The model answers with a single character: "U" (unique) or "D" (duplicate)
+        return response.choices[0].message.content[0].upper() == 'U'
 
     except Exception as e:
-        print(f"Error checking article uniqueness with OpenAI: {e}")
+        logger.error("Error checking article uniqueness with OpenAI: %s", e)
         return True
 
 
-def process_and_translate_article(main_content: str, additional_context: str = "") -> str:
+def _build_processing_messages(main_content: str, additional_context: str) -> Optional[list[dict]]:
     """
-    Process, clean, and translate article content in one step using LLM.
+    Builds the chat messages for the combined processing request, or None if the prompts are missing.
+    The system prompt is the article processing prompt followed by the title/description and JSON format rules.
     """
-    prompt_template = load_prompt("article_processing")
-    if not prompt_template:
-        return main_content
-    
+    processing_prompt = load_prompt("article_processing")
+    response_format_prompt = load_prompt("combined_response_format")
+    if not processing_prompt or not response_format_prompt:
+        return None
+
     # Prepare the content for analysis
     user_message = f"ОСНОВНИЙ КОНТЕНТ СТАТТІ:\n{main_content}"
     
     if additional_context.strip():
         user_message += f"\n\nДОДАТКОВИЙ КОНТЕКСТ (використовуй тільки релевантні частини):\n{additional_context}"
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-5-mini-2025-08-07",
-            messages=[
-                {"role": "system", "content": prompt_template},
-                {"role": "user", "content": user_message}
-            ],
-        )
-        
-        processed_content = response.choices[0].message.content.strip()
-        
-        # Remove any markdown code blocks if present
-        if processed_content.startswith('```html'):
-            processed_content = processed_content[7:]
-        if processed_content.endswith('```'):
-            processed_content = processed_content[:-3]
-        
-        return processed_content.strip()
-        
-    except Exception as e:
-        print(f"❌ Error processing article with OpenAI: {e}")
-        return main_content  # Return original if processing fails
+    return [
+        {"role": "system", "content": f"{processing_prompt}\n\n{response_format_prompt}"},
+        {"role": "user", "content": user_message}
+    ]
+
 
+def _clean_processed_content(processed_content: str) -> str:
+    """Removes any markdown code blocks the model may wrap around the HTML."""
+    processed_content = processed_content.strip()
+    if processed_content.startswith('```html'):
+        processed_content = processed_content[7:]
+    if processed_content.endswith('```'):
+        processed_content = processed_content[:-3]
+    return processed_content.strip()
 
-def generate_title_and_description(article_content: str) -> dict:
+
+def _parse_processing_response(response_content: str) -> dict:
     """
-    Generate Ukrainian title and description with embedded Telegraph link placeholder.
+    Parses the JSON returned by the combined processing request.
+    Raises ValueError if the response is not a JSON object of strings or has no processed content.
     """
-    prompt_template = load_prompt("title_description_generation")
-    if not prompt_template:
-        return {
-            "title": "Новина",
-            "description": "Цікава стаття"
-        }
-    
-    user_message = f"КОНТЕНТ СТАТТІ:\n{article_content}"
+    if not isinstance(response_content, str):
+        # content is None when the model refuses
+        raise ValueError("Response has no content")
+    result = json.loads(response_content)
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    for field in ('processed_content', 'title', 'description', 'link_word'):
+        if not isinstance(result.get(field) or '', str):
+            raise ValueError(f"Response field {field} is not a string")
+    processed_content = _clean_processed_content(result.get('processed_content') or '')
+    if not processed_content:
+        raise ValueError("Response contains no processed_content")
+
+    # Clean any trailing punctuation just in case
+    return {
+        "processed_content": processed_content,
+        "title": _TRAILING_PUNCT.sub('', (result.get('title') or 'Новина').strip()),
+        "description": _TRAILING_PUNCT.sub('', (result.get('description') or 'Цікава стаття').strip()),
+        "link_word": (result.get('link_word') or '').strip(),
+    }
+
+
+async def process_translate_and_title(main_content: str, additional_context: str = "") -> dict:
+    """
+    Process, clean, and translate article content and generate its title and description
+    with the word to link to the Telegraph page, all in a single LLM call.
+    """
+    key = _processing_cache.key(main_content, additional_context)
+    cached = await _processing_cache.get(key)
+    if cached is not None:
+        logger.info("♻️ Using cached processing result")
+        return dict(cached)
+
+    fallback = {
+        "processed_content": main_content,  # Return original if processing fails
+        "title": "Новина",
+        "description": "Цікава стаття",
+        "link_word": ""
+    }
+    messages = _build_processing_messages(main_content, additional_context)
+    if not messages:
+        return fallback
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-5-mini-2025-08-07",
-            messages=[
-                {"role": "system", "content": prompt_template},
-                {"role": "user", "content": user_message}
-            ],
+        response = await client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
             response_format={"type": "json_object"},
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        
-        # Clean any trailing punctuation just in case
-        if 'title' in result:
-            result['title'] = result['title'].rstrip('.,;:!?-–—').strip()
-        if 'description' in result:
-            result['description'] = result['description'].rstrip('.,;:!?-–—').strip()
-        
-        return result
+        result = _parse_processing_response(response.choices[0].message.content)
         
     except Exception as e:
-        print(f"❌ Error generating title and description with OpenAI: {e}")
-        return {
-            "title": "Новина",
-            "description": "Цікава стаття"
-        }
-def generate_facebook_post(article_content: str) -> str:
+        logger.error("❌ Error processing article with OpenAI: %s", e)
+        return fallback
+
+    # The fallback is never cached, so a failed call is retried next time
+    await _processing_cache.set(key, result)
+    return dict(result)
+
+
+def build_processing_batch_request(custom_id: str, main_content: str, additional_context: str = "") -> dict:
+    """
+    Builds one line of an OpenAI Batch API input file for processing an article.
+    """
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": CHAT_MODEL,
+            "messages": _build_processing_messages(main_content, additional_context),
+            "response_format": {"type": "json_object"},
+        },
+    }
+
+
+async def submit_batch(requests: List[dict]) -> str:
+    """
+    Uploads the requests as a JSONL file and starts an OpenAI batch. Returns the batch ID.
+    """
+    jsonl = "\n".join(json.dumps(request, ensure_ascii=False) for request in requests)
+    batch_file = await client.files.create(
+        file=("articles_batch.jsonl", jsonl.encode("utf-8")),
+        purpose="batch",
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    return batch.id
+
+
+async def retrieve_batch_results(batch_id: str) -> Optional[dict]:
+    """
+    Returns the processing results keyed by custom_id once the batch has finished,
+    or None while it is still running. Requests that failed are missing from the result.
+    """
+    batch = await client.batches.retrieve(batch_id)
+    if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+        return None
+
+    results = {}
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            # Any malformed line only drops its own article, which is then processed synchronously;
+            # letting it escape would fail the same batch on every poll
+            custom_id = None
+            try:
+                item = json.loads(line)
+                custom_id = item.get("custom_id")
+                response = item.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[item["custom_id"]] = _parse_processing_response(content)
+            except Exception as e:
+                logger.warning("⚠️ Invalid batch result for %s: %s", custom_id, e)
+
+    if batch.status != "completed":
+        logger.warning("⚠️ Batch %s finished with status '%s'", batch_id, batch.status)
+    return results
+
+
+async def generate_facebook_post(article_content: str) -> str:
     """
     Generates a catchy Facebook post with a headline and a short summary.
     """
@@ -134,19 +321,29 @@ def generate_facebook_post(article_content: str) -> str:
     if not prompt_template:
         return "Подивіться цю новину!"
 
+    # An article published again (or re-sent for moderation) gets the same post without another request
+    key = _facebook_post_cache.key(article_content)
+    cached = await _facebook_post_cache.get(key)
+    if cached is not None:
+        logger.info("♻️ Using cached Facebook post")
+        return cached
+
     user_message = f"ARTICLE CONTENT:\n{article_content}"
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-5-mini-2025-08-07",
+        response = await client.chat.completions.create(
+            model=CHAT_MODEL,
             messages=[
                 {"role": "system", "content": prompt_template},
                 {"role": "user", "content": user_message}
             ],
         )
         
-        return response.choices[0].message.content.strip()
+        facebook_post = response.choices[0].message.content.strip()
 
     except Exception as e:
-        print(f"❌ Error generating Facebook post with OpenAI: {e}")
-        return "Подивіться цю новину!"
\ No newline at end of file
+        logger.error("❌ Error generating Facebook post with OpenAI: %s", e)
+        return "Подивіться цю новину!"
+
+    await _facebook_post_cache.set(key, facebook_post)
+    return facebook_post
\ No newline at end of file
@@ -15,6 +15,19 @@ TELEGRAPH_ACCESS_TOKEN = os.getenv("TELEGRAPH_ACCESS_TOKEN")
 RSS_ARTICLES_COUNT = int(os.getenv("RSS_ARTICLES_COUNT", "5"))  # Default to 5 if not set
 CHECK_INTERVAL_SECONDS = int(os.getenv("CHECK_INTERVAL_SECONDS", "60")) # Default to 60 seconds
 MAKE_WEBHOOK_URL = os.getenv("MAKE_WEBHOOK_URL")
+# Submit article processing through the OpenAI Batch API (50% cheaper, results within 24h)
+OPENAI_BATCH_MODE = os.getenv("OPENAI_BATCH_MODE", "false").lower() == "true"
+BATCH_POLL_INTERVAL_SECONDS = int(os.getenv("BATCH_POLL_INTERVAL_SECONDS", "300")) # Default to 5 minutes
+# Cosine similarity band of the duplicate check: below LOW is unique, at or above HIGH is a duplicate,
+# in between the LLM decides
+DUPLICATE_SIMILARITY_LOW = float(os.getenv("DUPLICATE_SIMILARITY_LOW", "0.80"))
+DUPLICATE_SIMILARITY_HIGH = float(os.getenv("DUPLICATE_SIMILARITY_HIGH", "0.88"))
+# Write RSS data, raw HTML and processed content of every article to debug_files/
+DEBUG_DUMP = os.getenv("DEBUG_DUMP", "false").lower() in ("1", "true")
+# Number of concurrent workers of each processing stage
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "2"))
+TELEGRAPH_WORKERS = int(os.getenv("TELEGRAPH_WORKERS", "2"))
 
 
 # Basic validation to ensure all variables are set
@@ -40,3 +53,18 @@ if RSS_ARTICLES_COUNT < 1 or RSS_ARTICLES_COUNT > 10:
 if CHECK_INTERVAL_SECONDS < 10 or CHECK_INTERVAL_SECONDS > 3600: # From 10 seconds to 1 hour
     raise ValueError("CHECK_INTERVAL_SECONDS must be between 10 and 3600.")
 
+# Validate BATCH_POLL_INTERVAL_SECONDS
+if BATCH_POLL_INTERVAL_SECONDS < 10 or BATCH_POLL_INTERVAL_SECONDS > 3600:
+    raise ValueError("BATCH_POLL_INTERVAL_SECONDS must be between 10 and 3600.")
+
+# Validate the worker counts
+if SCRAPE_WORKERS < 1 or SCRAPE_WORKERS > 20:
+    raise ValueError("SCRAPE_WORKERS must be between 1 and 20.")
+if LLM_WORKERS < 1 or LLM_WORKERS > 20:
+    raise ValueError("LLM_WORKERS must be between 1 and 20.")
+if TELEGRAPH_WORKERS < 1 or TELEGRAPH_WORKERS > 20:
+    raise ValueError("TELEGRAPH_WORKERS must be between 1 and 20.")
+
+# Validate the duplicate similarity band
+if not 0 < DUPLICATE_SIMILARITY_LOW <= DUPLICATE_SIMILARITY_HIGH <= 1:
+    raise ValueError("DUPLICATE_SIMILARITY_LOW and DUPLICATE_SIMILARITY_HIGH must satisfy 0 < LOW <= HIGH <= 1.")
@@ -1,104 +1,253 @@
+import logging
+import hashlib
 import sqlite3
-from datetime import datetime
+import threading
+import numpy as np
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
 
 DB_NAME = 'news.db'
+EMBEDDING_DIMENSIONS = 1536  # text-embedding-3-small
+# Stored as the original content of semantic duplicates, whose rows are kept so they aren't checked again
+SEMANTIC_DUPLICATE_MARKER = "SEMANTIC_DUPLICATE_CHECKED"
+# Cached LLM results older than this are ignored and pruned on startup
+LLM_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# A single persistent connection shared by all callers (including asyncio.to_thread workers).
+# isolation_level=None puts it in autocommit mode; the lock serializes access across threads.
+_conn = sqlite3.connect(DB_NAME, check_same_thread=False, isolation_level=None)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.execute("PRAGMA temp_store=MEMORY")
+_conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+_lock = threading.Lock()
+
+# blake2b-128 hashes of every article URL in the database, loaded by init_db and kept in sync
+# by the claim/release functions, so known RSS links are filtered out without a query
+_link_hashes: set[bytes] = set()
+
+def _link_hash(original_url: str) -> bytes:
+    return hashlib.blake2b(original_url.encode('utf-8'), digest_size=16).digest()
+
+def _today_utc_bounds() -> tuple[str, str]:
+    """Returns today's local-day boundaries as UTC timestamps in SQLite's CURRENT_TIMESTAMP format."""
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = midnight.astimezone(timezone.utc)
+    end = (midnight + timedelta(days=1)).astimezone(timezone.utc)
+    return start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')
+
+def _decode_embedding(blob: bytes) -> np.ndarray:
+    """Decodes a stored int8 embedding. Float32 embeddings stored by older versions are quantized on the fly."""
+    if len(blob) == EMBEDDING_DIMENSIONS * 4:
+        vec = np.frombuffer(blob, dtype=np.float32)
+        return np.round(vec / np.abs(vec).max() * 127).astype(np.int8)
+    return np.frombuffer(blob, dtype=np.int8)
 
 def init_db():
     """Initializes the database and creates the articles table if it doesn't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS articles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            original_url TEXT NOT NULL UNIQUE,
-            title TEXT NOT NULL,
-            original_content TEXT,
-            translated_content TEXT,
-            telegraph_url TEXT,
-            image_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    with _lock:
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                original_url TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
+                original_content TEXT,
+                translated_content TEXT,
+                telegraph_url TEXT,
+                image_url TEXT,
+                embedding BLOB,
+                status TEXT,
+                batch_id TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Older databases were created without the newer columns
+        columns = {row[1] for row in _conn.execute('PRAGMA table_info(articles)')}
+        for column, column_type in (('embedding', 'BLOB'), ('status', 'TEXT'), ('batch_id', 'TEXT')):
+            if column not in columns:
+                _conn.execute(f'ALTER TABLE articles ADD COLUMN {column} {column_type}')
+        # Lets the "today's articles" queries use an index range scan
+        _conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_created_at ON articles(created_at)')
+        # Claims left unfinished by a previous run (stopped or crashed mid-pipeline) would block their URLs for good;
+        # drop them so the articles are picked up again. Published, pending-batch and duplicate rows are kept.
+        cursor = _conn.execute("""
+            DELETE FROM articles
+            WHERE telegraph_url IS NULL AND status IS NULL AND original_content IS NOT ?
+        """, (SEMANTIC_DUPLICATE_MARKER,))
+        if cursor.rowcount:
+            logger.info("Released %s unfinished article claim(s) from a previous run.", cursor.rowcount)
+        _link_hashes.clear()
+        _link_hashes.update(_link_hash(row[0]) for row in _conn.execute('SELECT original_url FROM articles'))
+        # Cached LLM results (see llm_cache.py), as JSON by the hash of their inputs
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        _conn.execute("DELETE FROM llm_cache WHERE created_at < datetime('now', ?)", (_llm_cache_cutoff(),))
+    logger.info("Database initialized.")
+
+def try_claim_article(original_url: str) -> int | None:
+    """
+    Atomically reserves a row for a new article URL.
+    Returns the new row's ID, or None if the URL was already claimed.
+    """
+    with _lock:
+        cursor = _conn.execute(
+            "INSERT OR IGNORE INTO articles (original_url, title, original_content) VALUES (?, '', '')",
+            (original_url,)
         )
-    ''')
-    conn.commit()
-    conn.close()
-    print("Database initialized.")
-
-def add_article_base(original_url: str, title: str, original_content: str, image_url: str = None) -> int | None:
-    """Adds a new article with its original content and returns the new row's ID."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO articles (original_url, title, original_content, image_url)
-            VALUES (?, ?, ?, ?)
-        ''', (original_url, title, original_content, image_url))
-        conn.commit()
+        if cursor.rowcount != 1:
+            return None
+        _link_hashes.add(_link_hash(original_url))
         return cursor.lastrowid
-    except sqlite3.IntegrityError:
-        print(f"Article with URL {original_url} already exists.")
-        return None
-    finally:
-        conn.close()
-
-def update_article_translation(article_id: int, translated_content: str, telegraph_url: str):
-    """Updates an article with its translated content and Telegraph URL."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE articles
-        SET translated_content = ?, telegraph_url = ?
-        WHERE id = ?
-    ''', (translated_content, telegraph_url, article_id))
-    conn.commit()
-    conn.close()
-
-def article_exists(original_url: str) -> bool:
-    """Checks if an article with the given URL already exists."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id FROM articles WHERE original_url = ?', (original_url,))
-    result = cursor.fetchone()
-    conn.close()
-    return result is not None
+
+def release_article(article_id: int):
+    """
+    Deletes a claimed article so its URL is picked up again on the next check.
+    Published and pending-batch articles are kept, so a late release can't cause a second publication.
+    """
+    with _lock:
+        row = _conn.execute(
+            'SELECT original_url FROM articles WHERE id = ? AND telegraph_url IS NULL AND status IS NULL', (article_id,)
+        ).fetchone()
+        if row:
+            _conn.execute('DELETE FROM articles WHERE id = ?', (article_id,))
+            _link_hashes.discard(_link_hash(row[0]))
+
+def update_article_base(article_id: int, title: str, original_content: str, image_url: str = None,
+                        embedding: np.ndarray | None = None):
+    """Stores the original content (and int8 embedding) of a claimed article."""
+    embedding_blob = embedding.astype(np.int8).tobytes() if embedding is not None else None
+    with _lock:
+        _conn.execute('''
+            UPDATE articles
+            SET title = ?, original_content = ?, image_url = ?, embedding = ?
+            WHERE id = ?
+        ''', (title, original_content, image_url, embedding_blob, article_id))
+
+def complete_article(article_id: int, title: str, translated_content: str, telegraph_url: str):
+    """Stores the final title, translated content and Telegraph URL of an article and clears its pending state."""
+    with _lock:
+        _conn.execute('''
+            UPDATE articles
+            SET title = ?, translated_content = ?, telegraph_url = ?, status = NULL
+            WHERE id = ?
+        ''', (title, translated_content, telegraph_url, article_id))
+
+def mark_articles_pending_batch(article_ids: list[int], batch_id: str):
+    """Marks articles as waiting for the results of an OpenAI batch."""
+    with _lock:
+        _conn.executemany(
+            "UPDATE articles SET status = 'pending_batch', batch_id = ? WHERE id = ?",
+            [(batch_id, article_id) for article_id in article_ids]
+        )
+
+def get_pending_batch_articles() -> list[dict]:
+    """Retrieves all articles that are waiting for OpenAI batch results."""
+    with _lock:
+        cursor = _conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute('''
+            SELECT id, original_url, original_content, image_url, batch_id FROM articles
+            WHERE status = 'pending_batch'
+        ''')
+        results = cursor.fetchall()
+    return [dict(row) for row in results]
+
+def _llm_cache_cutoff() -> str:
+    """Returns the SQLite datetime() modifier of the oldest LLM cache entry still valid."""
+    return f'-{LLM_CACHE_TTL_SECONDS} seconds'
+
+def get_llm_cache_entry(key: str) -> str | None:
+    """Retrieves a cached LLM result (JSON) by its key, unless it has expired."""
+    with _lock:
+        result = _conn.execute(
+            "SELECT value FROM llm_cache WHERE key = ? AND created_at >= datetime('now', ?)", (key, _llm_cache_cutoff())
+        ).fetchone()
+    return result[0] if result else None
+
+def save_llm_cache_entry(key: str, value: str):
+    """Stores an LLM result (JSON) under its key."""
+    with _lock:
+        _conn.execute('INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)', (key, value))
+
+def get_existing_links(original_urls: list[str]) -> set[str]:
+    """Returns the subset of the given URLs that already exist in the database (an in-memory lookup)."""
+    with _lock:
+        return {url for url in original_urls if _link_hash(url) in _link_hashes}
 
 def get_todays_articles_content() -> list[str]:
     """Retrieves the original content of the last 5 articles published today."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute("""
-        SELECT original_content FROM articles 
-        WHERE DATE(created_at, 'localtime') = ? 
-        AND original_content IS NOT NULL
-        ORDER BY created_at DESC 
-        LIMIT 5
-    """, (today_str,))
-    results = cursor.fetchall()
-    conn.close()
+    start, end = _today_utc_bounds()
+    with _lock:
+        results = _conn.execute("""
+            SELECT original_content FROM articles
+            WHERE created_at >= ? AND created_at < ?
+            AND original_content IS NOT NULL AND original_content != '' AND original_content != ?
+            ORDER BY created_at DESC
+            LIMIT 5
+        """, (start, end, SEMANTIC_DUPLICATE_MARKER)).fetchall()
     return [row[0] for row in results]
 
+def get_todays_article_embeddings() -> tuple[list[int], np.ndarray]:
+    """
+    Retrieves the stored int8 embeddings of all articles published today as an (N, dim) matrix,
+    together with the IDs of the articles in the order of its rows.
+    """
+    start, end = _today_utc_bounds()
+    with _lock:
+        results = _conn.execute("""
+            SELECT id, embedding FROM articles
+            WHERE created_at >= ? AND created_at < ?
+            AND embedding IS NOT NULL
+        """, (start, end)).fetchall()
+    if not results:
+        return [], np.empty((0, 0), dtype=np.int8)
+    return [row[0] for row in results], np.vstack([_decode_embedding(row[1]) for row in results])
+
+def get_article_content(article_id: int) -> str | None:
+    """Retrieves the original content of an article by its ID."""
+    with _lock:
+        result = _conn.execute('SELECT original_content FROM articles WHERE id = ?', (article_id,)).fetchone()
+    return result[0] if result else None
+
+def get_recent_published_articles(limit: int = 5) -> list[tuple]:
+    """
+    Retrieves the latest articles that have a Telegraph page, newest first,
+    as plain (id, title, original_url, telegraph_url, translated_content) tuples.
+    """
+    with _lock:
+        return _conn.execute("""
+            SELECT id, title, original_url, telegraph_url, translated_content
+            FROM articles
+            WHERE telegraph_url IS NOT NULL AND translated_content IS NOT NULL
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+
 def get_article_by_telegraph_url(telegraph_url: str) -> dict | None:
     """Retrieves article data by its telegraph_url."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT title, telegraph_url FROM articles WHERE telegraph_url = ?', (telegraph_url,))
-    result = cursor.fetchone()
-    conn.close()
+    with _lock:
+        result = _conn.execute(
+            'SELECT title, telegraph_url FROM articles WHERE telegraph_url = ?', (telegraph_url,)
+        ).fetchone()
     if result:
         return {"title": result[0], "telegraph_url": result[1]}
     return None
 
 def get_article_by_id(article_id: int) -> dict | None:
     """Retrieves article data by its ID, including its content."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row  # Allows accessing columns by name
-    cursor = conn.cursor()
-    # Fetch the translated_content as it's the final, processed version
-    cursor.execute('SELECT id, title, telegraph_url, translated_content, image_url FROM articles WHERE id = ?', (article_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with _lock:
+        cursor = _conn.cursor()
+        cursor.row_factory = sqlite3.Row  # Allows accessing columns by name
+        # Fetch the translated_content as it's the final, processed version
+        cursor.execute('SELECT id, title, telegraph_url, translated_content, image_url FROM articles WHERE id = ?', (article_id,))
+        result = cursor.fetchone()
     if result:
         # Convert the sqlite3.Row object to a dictionary
         return dict(result)
     return None
-
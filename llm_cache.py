@@ -0,0 +1,41 @@
+import asyncio
+import hashlib
+import json
+from cachetools import TTLCache
+from database import get_llm_cache_entry, save_llm_cache_entry, LLM_CACHE_TTL_SECONDS
+
+class LLMCache:
+    """
+    Exact-match cache for LLM and embedding results, keyed by a blake2b hash of the inputs.
+    An in-memory TTL cache sits in front of the llm_cache SQLite table, so results survive restarts;
+    both expire after LLM_CACHE_TTL_SECONDS.
+    Persisted values must be JSON-serializable; caches with persist=False can hold any object.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 256, persist: bool = True):
+        self.namespace = namespace
+        self.persist = persist
+        self._entries = TTLCache(maxsize=maxsize, ttl=LLM_CACHE_TTL_SECONDS)
+
+    def key(self, *parts: str) -> str:
+        """Builds the cache key of the given inputs."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return f"{self.namespace}:{digest.hexdigest()}"
+
+    async def get(self, key: str):
+        """Returns the cached value, or None on a miss."""
+        value = self._entries.get(key)
+        if value is None and self.persist:
+            stored = await asyncio.to_thread(get_llm_cache_entry, key)
+            if stored is not None:
+                value = self._entries[key] = json.loads(stored)
+        return value
+
+    async def set(self, key: str, value):
+        """Stores a value in memory and, for persistent caches, in the database."""
+        self._entries[key] = value
+        if self.persist:
+            await asyncio.to_thread(save_llm_cache_entry, key, json.dumps(value, ensure_ascii=False))
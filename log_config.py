@@ -0,0 +1,27 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+def setup_logging():
+    """
+    Configures logging for the bot and its scripts. The level comes from the LOG_LEVEL env variable.
+    Records are only queued by the logging call; a background listener thread writes them to stderr,
+    so the event loop never blocks on console output.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    # Flushes the remaining records on exit
+    atexit.register(listener.stop)
+
+    # The queued record carries the bare message; the listener's handler applies the real format
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[queue_handler])
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -1,247 +1,530 @@
+import logging
 import asyncio
-import time
+import contextlib
+import html
 import json
 import os
-from database import init_db, article_exists, add_article_base, update_article_translation, get_todays_articles_content
-from rss_reader import get_latest_articles
+import numpy as np
+from database import (
+    init_db, get_existing_links, try_claim_article, release_article, update_article_base, complete_article,
+    get_todays_articles_content, get_todays_article_embeddings, get_article_content,
+    mark_articles_pending_batch, get_pending_batch_articles, SEMANTIC_DUPLICATE_MARKER
+)
+from rss_reader import get_latest_articles_async
 from scraper import scrape_article_content
-from ai_handler import is_article_unique, process_and_translate_article, generate_title_and_description
+from ai_handler import (
+    get_embedding, classify_by_similarity, is_article_unique, process_translate_and_title,
+    build_processing_batch_request, submit_batch, retrieve_batch_results
+)
 from telegraph_client import create_telegraph_page
 from telegram_bot import send_for_moderation, run_bot, stop_bot
-from config import CHECK_INTERVAL_SECONDS
+from log_config import setup_logging
+from config import (
+    RSS_FEEDS, RSS_ARTICLES_COUNT, CHECK_INTERVAL_SECONDS, OPENAI_BATCH_MODE, BATCH_POLL_INTERVAL_SECONDS,
+    SCRAPE_WORKERS, LLM_WORKERS, TELEGRAPH_WORKERS, DEBUG_DUMP
+)
 
-# Global lock to prevent concurrent execution
-processing_lock = asyncio.Lock()
+logger = logging.getLogger(__name__)
 
-async def check_news_job():
-    """Checks for new articles and processes them."""
-    # Try to acquire lock, skip if already locked
-    if processing_lock.locked():
-        print("⏳ Previous job still running, skipping this check...")
-        return
+# Pipeline: check_news_job → scrape → dedup → process (LLM) → Telegraph/moderation.
+# Every stage is a pool of workers consuming a bounded queue, so the stages overlap
+# and a full queue slows the previous stage down instead of dropping articles.
+# The worker counts of the stages come from the config.
+QUEUE_SIZE = 20
+
+scrape_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+dedup_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+process_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+telegraph_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+# Scheduled news checks. A tick that arrives while a check runs waits for it instead of being dropped;
+# one pending tick is enough, since more would only re-fetch the same feeds back to back.
+check_ticks: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+DEBUG_DIR = "debug_files"
+
+def write_debug_file(filename: str, content: str):
+    """Writes a debug dump to DEBUG_DIR. Blocking, so it is called through asyncio.to_thread."""
+    os.makedirs(DEBUG_DIR, exist_ok=True)
+    path = os.path.join(DEBUG_DIR, filename)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    logger.info("💾 Saved debug file: %s", path)
+
+async def scrape_article(article_id: int, title: str, link: str) -> dict | None:
+    """Scrapes a claimed article and computes its embedding for the duplicate check."""
+    # 1. Save RSS data
+    if DEBUG_DUMP:
+        await asyncio.to_thread(
+            write_debug_file, f"rss_data_article_{article_id}.json",
+            json.dumps({'title': title, 'link': link}, indent=2, ensure_ascii=False)
+        )
     
-    async with processing_lock:
-        try:
-            print("\n🔍 --- Checking for new articles... ---")
-            
-            # Create debug directory if it doesn't exist
-            # debug_dir = "debug_files"
-            # os.makedirs(debug_dir, exist_ok=True)
-            
-            # 1. Get latest articles from RSS feeds
-            print("📡 Fetching RSS feeds (last 5 articles per feed)...")
-            from config import RSS_FEEDS, RSS_ARTICLES_COUNT
+    # 2. Scrape article content
+    logger.info("🕷️ Scraping article content...")
+    scraped_content = await scrape_article_content(link, keep_raw_html=DEBUG_DUMP)
+    if not scraped_content:
+        logger.error("❌ Failed to scrape content")
+        await asyncio.to_thread(release_article, article_id)
+        return None
+
+    logger.info("✅ Content scraped successfully (%s chars)", len(scraped_content['content_html']))
+    
+    # 2. Save raw HTML data (original from website)
+    if DEBUG_DUMP:
+        await asyncio.to_thread(write_debug_file, f"raw_html_article_{article_id}.html", "\n".join([
+            f"<!-- Title: {scraped_content['title']} -->",
+            f"<!-- URL: {link} -->",
+            f"<!-- Image: {scraped_content.get('image_url', 'None')} -->",
+            "<!-- This is the ORIGINAL HTML from the website -->",
+            "",
+            scraped_content.pop('raw_html'),  # Not needed further down the pipeline
+        ]))
+    
+    return {
+        'article_id': article_id,
+        'title': title,
+        'link': link,
+        'scraped_content': scraped_content,
+        'embedding': await get_embedding(scraped_content['content_html']),
+    }
+
+async def select_unique_articles(prepared: list[dict]) -> list[dict]:
+    """
+    Runs the duplicate check on the prepared articles and returns the unique ones.
+    Articles are checked one at a time against today's articles and those accepted earlier in the same check.
+    Embeddings decide the clear cases locally; an ambiguous article is compared by the LLM
+    with the article its embedding matched best.
+    """
+    # 3. Check for semantic uniqueness FIRST (before expensive operations)
+    logger.info("🤖 Checking for duplicates with embeddings...")
+    known_ids, known_embeddings = await asyncio.to_thread(get_todays_article_embeddings)
+    # Content of the articles accepted in this check by ID, so the LLM fallback can compare against them
+    accepted_content = {}
+    unique = []
+    for item in prepared:
+        content = item['scraped_content']['content_html']
+        is_unique, best_match = classify_by_similarity(item['embedding'], known_embeddings)
+        if is_unique is None:
+            if best_match is None:
+                # No embedding to go by: compare with the latest articles of today and this check
+                todays_content = await asyncio.to_thread(get_todays_articles_content)
+                compared = list(dict.fromkeys(todays_content + list(accepted_content.values())))
+            else:
+                match_id = known_ids[best_match]
+                compared = [accepted_content.get(match_id) or await asyncio.to_thread(get_article_content, match_id)]
+            logger.info("🤖 Checking ambiguous article with AI: '%s'", item['title'])
+            is_unique = await is_article_unique(content, [text for text in compared if text])
+
+        if not is_unique:
+            await reject_duplicate_article(item)
+            continue
+        await accept_unique_article(item)
+        unique.append(item)
+        accepted_content[item['article_id']] = content
+        if item['embedding'] is not None:
+            known_ids.append(item['article_id'])
+            known_embeddings = (
+                np.vstack([known_embeddings, item['embedding']]) if known_embeddings.size
+                else item['embedding'][np.newaxis, :]
+            )
+
+    return unique
+
+async def accept_unique_article(item: dict):
+    """Stores the original content and embedding of a unique article so later articles are compared against it."""
+    logger.info("✅ Article is unique: '%s'", item['title'])
+    await asyncio.to_thread(
+        update_article_base, item['article_id'], item['title'], item['scraped_content']['content_html'],
+        item['scraped_content'].get('image_url'), item['embedding']
+    )
+
+async def reject_duplicate_article(item: dict):
+    """Keeps the claimed row of a duplicate with a special marker to prevent it from being checked again."""
+    logger.warning("⚠️ Article appears to be a semantic duplicate, skipping processing: '%s'", item['title'])
+    await asyncio.to_thread(update_article_base, item['article_id'], item['title'], SEMANTIC_DUPLICATE_MARKER)
+    logger.info("📝 Saved as duplicate to prevent future checks.")
+
+async def process_candidate(candidate: dict) -> dict:
+    """Processes and translates a unique article, generating its title and description."""
+    scraped_content = candidate['scraped_content']
+    
+    # 4. Process, clean, translate article and generate title and description in one step
+    logger.info("🔧 Processing, cleaning, translating article and generating title...")
+    additional_context = scraped_content.get('additional_context', '')
+    result = await process_translate_and_title(scraped_content['content_html'], additional_context)
+    processed_content = result['processed_content']
+    
+    # Log processing stats
+    logger.info("✅ Article processed: %s → %s chars", len(scraped_content['content_html']), len(processed_content))
+    if additional_context:
+        logger.info("📝 Used %s chars of additional context", len(additional_context))
+    return result
+
+async def finish_article(article_id: int, link: str, result: dict) -> bool:
+    """
+    Creates the Telegraph page for a processed article, saves it and sends it for moderation.
+    """
+    processed_content = result['processed_content']
+    # 5. The title and description are plain text; the Telegraph page uses the title as is
+    title = result['title']
+    description = result['description']
+    
+    # 6. Create Telegraph page
+    logger.info("📝 Creating Telegraph page...")
+    telegraph_url = await asyncio.to_thread(create_telegraph_page, title, processed_content)
+    
+    if not telegraph_url:
+        logger.error("❌ Failed to create Telegraph page")
+        return False
+        
+    logger.info("✅ Telegraph page created: %s", telegraph_url)
+
+    # 7. Link the word chosen by the AI to the Telegraph page
+    final_title, final_description = embed_telegraph_link(title, description, result.get('link_word', ''), telegraph_url)
+    logger.info("✅ Generated final title: '%s'", final_title)
+    logger.info("✅ Generated final description: '%s'", final_description)
+
+    # 8. Save to database before sending to Telegram for moderation: the Publish button reads the saved article,
+    # and a failed save must not leave a moderation message behind for an article that will be retried
+    logger.info("💾 Saving to database...")
+    await asyncio.to_thread(complete_article, article_id, final_title, processed_content, telegraph_url)
+    logger.info("📱 Sending to Telegram for moderation...")
+    await send_article_for_moderation(final_title, final_description, link, article_id)
+
+    # 9. Save processed content for debugging
+    if DEBUG_DUMP:
+        await asyncio.to_thread(write_debug_file, f"processed_article_{article_id}.html", "\n".join([
+            f"<!-- Processed Title: {final_title} -->",
+            f"<!-- URL: {link} -->",
+            f"<!-- Processed Length: {len(processed_content)} chars -->",
+            f"<!-- Description: {final_description} -->",
+            processed_content,
+        ]))
+
+    logger.info("🎉 Article processing completed successfully!")
+    logger.info("📊 Telegraph URL: %s", telegraph_url)
+    return True
+
+def embed_telegraph_link(title: str, description: str, link_word: str, telegraph_url: str) -> tuple[str, str]:
+    """
+    Wraps the first occurrence of link_word in the title, or else in the description, into a link to the Telegraph page.
+    If the word is found in neither, the whole title becomes the link.
+    The title and description are plain text; they are returned as HTML for Telegram, with the text escaped.
+    """
+    href = html.escape(telegraph_url)
+    if link_word:
+        # One find per text on the plain text, then the pieces are escaped and the anchor is sliced in;
+        # the description is only searched if the title has no match
+        anchor = f'<a href="{href}">{html.escape(link_word, quote=False)}</a>'
+        index = title.find(link_word)
+        if index != -1:
+            return _escape_around(title, index, len(link_word), anchor), html.escape(description, quote=False)
+        index = description.find(link_word)
+        if index != -1:
+            return html.escape(title, quote=False), _escape_around(description, index, len(link_word), anchor)
+    return f'<a href="{href}">{html.escape(title, quote=False)}</a>', html.escape(description, quote=False)
+
+def _escape_around(text: str, index: int, length: int, anchor: str) -> str:
+    """Replaces text[index:index + length] with the anchor, escaping the rest of the text."""
+    return html.escape(text[:index], quote=False) + anchor + html.escape(text[index + length:], quote=False)
+
+async def send_article_for_moderation(title: str, description: str, link: str, article_id: int):
+    """Sends a published article to the moderation channel; a failure is logged, not raised."""
+    try:
+        await send_for_moderation(title, description, link, article_id)
+        logger.info("✅ Sent to moderation channel successfully!")
+    except Exception as e:
+        logger.error("❌ Error sending to Telegram: %s", e)
+
+async def submit_articles_batch(candidates: list[dict]) -> int:
+    """Submits the processing of the candidates to the OpenAI Batch API. Returns the number submitted."""
+    article_ids = [candidate['article_id'] for candidate in candidates]
+    requests = [
+        build_processing_batch_request(
+            str(candidate['article_id']),
+            candidate['scraped_content']['content_html'],
+            candidate['scraped_content'].get('additional_context', '')
+        )
+        for candidate in candidates
+    ]
+
+    try:
+        batch_id = await submit_batch(requests)
+    except Exception as e:
+        logger.error("❌ Error submitting OpenAI batch, processing synchronously instead: %s", e)
+        # Only these candidates go through the regular pipeline; they are never marked pending,
+        # so the batch poller can't pick them up and publish them a second time
+        for candidate in candidates:
+            await process_and_queue(candidate)
+        return 0
+
+    await asyncio.to_thread(mark_articles_pending_batch, article_ids, batch_id)
+    logger.info("📦 Submitted %s article(s) to OpenAI batch %s", len(article_ids), batch_id)
+    return len(article_ids)
+
+async def check_news_job():
+    """Checks the RSS feeds and queues new articles for processing."""
+    try:
+        logger.info("🔍 --- Checking for new articles... ---")
+        
+        # 1. Get latest articles from RSS feeds
+        logger.info("📡 Fetching RSS feeds (last 5 articles per feed)...")
+        
+        # Collect articles from all RSS feeds concurrently
+        feed_results = await get_latest_articles_async(RSS_FEEDS, RSS_ARTICLES_COUNT)
+        articles = []
+        for feed_url, feed_articles in zip(RSS_FEEDS, feed_results):
+            if feed_articles:
+                articles.extend(feed_articles)
+                logger.info("✅ Found %s article(s) from feed: %s", len(feed_articles), feed_url)
+            else:
+                logger.info("📭 No articles found in feed: %s", feed_url)
+        
+        if not articles:
+            logger.info("📭 No articles found in any RSS feeds")
+            return
             
-            # Collect articles from all RSS feeds
-            articles = []
-            for feed_url in RSS_FEEDS:
-                print(f"📡 Fetching from feed: {feed_url}")
-                feed_articles = get_latest_articles(feed_url, RSS_ARTICLES_COUNT)
-                if feed_articles:
-                    articles.extend(feed_articles)
-                    print(f"✅ Found {len(feed_articles)} article(s) from this feed")
-                else:
-                    print(f"📭 No articles found in this feed")
+        logger.info("📊 Found %s total article(s) to check from %s feed(s)", len(articles), len(RSS_FEEDS))
+        
+        # Look up all known links at once (in memory) so only new articles need a claim
+        existing_links = get_existing_links([article.get('link', '') for article in articles])
+        
+        queued_count = 0
+        for i, article in enumerate(articles, 1):
+            title = article.get('title', 'No Title')
+            link = article.get('link', '')
             
-            if not articles:
-                print("📭 No articles found in any RSS feeds")
-                return
-                
-            print(f"📊 Found {len(articles)} total article(s) to check from {len(RSS_FEEDS)} feed(s)")
+            logger.info("📰 Article %s/%s: '%s'", i, len(articles), title)
+            logger.info("🔗 URL: %s", link)
             
-            processed_count = 0
+            if link in existing_links:
+                logger.info("📋 Article already exists in database, skipping...")
+                continue
             
-            for i, article in enumerate(articles, 1):
-                title = article.get('title', 'No Title')
-                link = article.get('link', '')
-                
-                print(f"\n📰 Article {i}/{len(articles)}: '{title}'")
-                print(f"🔗 URL: {link}")
-                
-                # Check if article already exists
-                if article_exists(link):
-                    print("📋 Article already exists in database, skipping...")
-                    continue
-                    
-                print("🆕 New article found! Starting processing...")
-                
-                # 1. Save RSS data
-                # rss_file = f"{debug_dir}/rss_data_article_{i}.json"
-                # with open(rss_file, 'w', encoding='utf-8') as f:
-                #     json.dump(article, f, indent=2, ensure_ascii=False)
-                # print(f"💾 Saved RSS data to: {rss_file}")
-                
-                # 2. Scrape article content
-                print("🕷️ Scraping article content...")
-                scraped_content = await asyncio.to_thread(scrape_article_content, link)
-                if not scraped_content:
-                    print(f"❌ Failed to scrape content")
-                    continue
+            # Claim the URL in the database; this fails if the article was claimed in the meantime
+            article_id = await asyncio.to_thread(try_claim_article, link)
+            if article_id is None:
+                logger.info("📋 Article already exists in database, skipping...")
+                continue
             
-                print(f"✅ Content scraped successfully ({len(scraped_content['content_html'])} chars)")
-                
-                # 2. Save raw HTML data (original from website)
-                # raw_html_file = f"{debug_dir}/raw_html_article_{i}.html"
-                # with open(raw_html_file, 'w', encoding='utf-8') as f:
-                #     f.write(f"<!-- Title: {scraped_content['title']} -->\n")
-                #     f.write(f"<!-- URL: {link} -->\n")
-                #     f.write(f"<!-- Image: {scraped_content.get('image_url', 'None')} -->\n")
-                #     f.write(f"<!-- This is the ORIGINAL HTML from the website -->\n\n")
-                #     f.write(scraped_content['raw_html'])
-                # print(f"💾 Saved raw HTML to: {raw_html_file}")
-                
-                # 3. Check for semantic uniqueness with AI FIRST (before expensive operations)
-                print("🤖 Checking for duplicates with AI...")
-                todays_articles = await asyncio.to_thread(get_todays_articles_content)
-                is_unique = await asyncio.to_thread(
-                    is_article_unique, scraped_content['content_html'], todays_articles
-                )
-                if not is_unique:
-                    print("⚠️ Article appears to be a semantic duplicate, skipping processing...")
-                    # Add the article to the DB with a special marker in content
-                    # to prevent it from being scraped and checked again in the future.
-                    await asyncio.to_thread(add_article_base, link, title, "SEMANTIC_DUPLICATE_CHECKED", None)
-                    print("📝 Saved as duplicate to prevent future checks.")
-                    continue
-                
-                print("✅ Article is unique!")
-                
-                # 4. Process, clean, and translate article in one step
-                print("🔧 Processing, cleaning, and translating article...")
-                additional_context = scraped_content.get('additional_context', '')
-                processed_content = await asyncio.to_thread(
-                    process_and_translate_article, scraped_content['content_html'], additional_context
-                )
-                
-                # Log processing stats
-                original_paragraphs = scraped_content['content_html'].count('<p>')
-                processed_paragraphs = processed_content.count('<p>')
-                print(f"✅ Article processed: {original_paragraphs} → {processed_paragraphs} paragraphs")
-                if additional_context:
-                    print(f"📝 Used {len(additional_context)} chars of additional context")
-
-                # 5. Generate title and description with a placeholder for the link
-                print("📝 Generating title and description with placeholder...")
-                title_data = await asyncio.to_thread(generate_title_and_description, processed_content)
-                title_with_placeholder = title_data.get('title', 'Новина')
-                description_with_placeholder = title_data.get('description', 'Цікава стаття')
-
-                # Extract a clean title for the Telegraph page (by removing the placeholder link)
-                import re
-                clean_title_for_telegraph = re.sub(r'<a href="LINK_PLACEHOLDER">(.+?)</a>', r'\1', title_with_placeholder)
-                
-                # 6. Create Telegraph page using the clean title
-                print("📝 Creating Telegraph page...")
-                telegraph_url = await asyncio.to_thread(create_telegraph_page, clean_title_for_telegraph, processed_content)
-                
-                if not telegraph_url:
-                    print("❌ Failed to create Telegraph page")
-                    continue
-                    
-                print(f"✅ Telegraph page created: {telegraph_url}")
-
-                # 7. Replace placeholder with the real Telegraph URL
-                final_title = title_with_placeholder.replace('LINK_PLACEHOLDER', telegraph_url)
-                final_description = description_with_placeholder.replace('LINK_PLACEHOLDER', telegraph_url)
-                print(f"✅ Generated final title: '{final_title}'")
-                print(f"✅ Generated final description: '{final_description}'")
-
-                # 8. Save to database
-                print("💾 Saving to database...")
-                image_url = scraped_content.get('image_url')
-                article_id = await asyncio.to_thread(add_article_base, link, final_title, processed_content, image_url)
-                if not article_id:
-                    print("❌ Failed to save article to database")
-                    continue
-
-                # 9. Save processed content for debugging
-                # processed_file = f"{debug_dir}/processed_article_{i}.html"
-                # with open(processed_file, 'w', encoding='utf-8') as f:
-                #     f.write(f"<!-- Original Title: {scraped_content['title']} -->\n")
-                #     f.write(f"<!-- Processed Title: {final_title} -->\n")
-                #     f.write(f"<!-- URL: {link} -->\n")
-                #     f.write(f"<!-- Original Length: {len(scraped_content['content_html'])} chars -->\n")
-                #     f.write(f"<!-- Processed Length: {len(processed_content)} chars -->\n")
-                #     f.write(f"<!-- Description: {final_description} -->\n")
-                #     f.write(processed_content)
-                # print(f"💾 Saved processed content to: {processed_file}")
-
-                # 10. Update database with Telegraph URL
-                await asyncio.to_thread(update_article_translation, article_id, processed_content, telegraph_url)
-
-                # 11. Send to Telegram for moderation
-                print("📱 Sending to Telegram for moderation...")
+            logger.info("🆕 New article found! Queued for processing...")
+            await scrape_queue.put({'article_id': article_id, 'title': title, 'link': link})
+            queued_count += 1
+        
+        if queued_count > 0:
+            logger.info("📈 Queued %s new article(s)", queued_count)
+        else:
+            logger.info("📋 No new articles to process")
+
+    except Exception as e:
+        logger.error("💥 Unexpected error during processing: %s", e)
+    finally:
+        logger.info("--- Finished checking articles. ---")
+
+def drain_queue(queue: asyncio.Queue, first) -> list:
+    """Returns the first item together with all items already waiting in the queue."""
+    items = [first]
+    while True:
+        try:
+            items.append(queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return items
+
+@contextlib.contextmanager
+def release_on_cancel(article_ids: list[int]):
+    """
+    Releases the claims of the articles a worker holds if it is cancelled (on shutdown), so they are
+    picked up again after a restart. Called synchronously: the loop is shutting down anyway.
+    """
+    try:
+        yield
+    except asyncio.CancelledError:
+        for article_id in article_ids:
+            release_article(article_id)
+        raise
+
+async def scrape_worker():
+    """Scrapes and embeds claimed articles."""
+    while True:
+        item = await scrape_queue.get()
+        with release_on_cancel([item['article_id']]):
+            try:
+                prepared = await scrape_article(item['article_id'], item['title'], item['link'])
+            except Exception as e:
+                logger.error("💥 Error scraping article %s: %s", item['link'], e)
+                # Release the claim so the article is retried on the next check
+                await asyncio.to_thread(release_article, item['article_id'])
+                continue
+            if prepared:
+                await dedup_queue.put(prepared)
+
+async def dedup_worker():
+    """
+    Runs the duplicate check on everything scraped so far in one go.
+    A single worker keeps the checks sequential, so every article is compared against all accepted before it.
+    """
+    while True:
+        prepared = drain_queue(dedup_queue, await dedup_queue.get())
+        with release_on_cancel([item['article_id'] for item in prepared]):
+            try:
+                candidates = await select_unique_articles(prepared)
+            except Exception as e:
+                logger.error("💥 Error checking duplicates: %s", e)
+                for item in prepared:
+                    await asyncio.to_thread(release_article, item['article_id'])
+                continue
+            for candidate in candidates:
+                await process_queue.put(candidate)
+
+async def process_worker():
+    """Processes unique articles with the LLM, or submits them to the Batch API in batch mode."""
+    while True:
+        candidate = await process_queue.get()
+        # A single article is processed right away to keep its latency low
+        candidates = drain_queue(process_queue, candidate) if OPENAI_BATCH_MODE else [candidate]
+        with release_on_cancel([candidate['article_id'] for candidate in candidates]):
+            if len(candidates) > 1:
                 try:
-                    await send_for_moderation(final_title, final_description, link, article_id)
-                    print("✅ Sent to moderation channel successfully!")
+                    submitted_count = await submit_articles_batch(candidates)
+                    logger.info("📈 %s new article(s) waiting for batch processing", submitted_count)
                 except Exception as e:
-                    print(f"❌ Error sending to Telegram: {e}")
-
-                print(f"🎉 Article processing completed successfully!")
-                print(f"📊 Telegraph URL: {telegraph_url}")
-                
-                processed_count += 1
-                
-                # Small delay between processing multiple articles
-                if i < len(articles):
-                    print("⏱️ Waiting 5 seconds before next article...")
-                    await asyncio.sleep(5)
+                    logger.error("💥 Error submitting batch: %s", e)
+                continue
             
-            if processed_count > 0:
-                print(f"📈 Successfully processed {processed_count} new article(s)")
-            else:
-                print("📋 No new articles to process")
+            await process_and_queue(candidate)
+
+async def process_and_queue(candidate: dict):
+    """Processes a unique article with the LLM and queues it for Telegraph; on failure its claim is released."""
+    try:
+        result = await process_candidate(candidate)
+    except Exception as e:
+        logger.error("💥 Error processing article %s: %s", candidate['link'], e)
+        await asyncio.to_thread(release_article, candidate['article_id'])
+        return
+    await telegraph_queue.put({'article_id': candidate['article_id'], 'link': candidate['link'], 'result': result})
+
+async def telegraph_worker():
+    """Publishes processed articles to Telegraph and sends them for moderation."""
+    while True:
+        item = await telegraph_queue.get()
+        published = False
+        with release_on_cancel([item['article_id']]):
+            try:
+                published = await finish_article(item['article_id'], item['link'], item['result'])
+            except Exception as e:
+                logger.error("💥 Error publishing article %s: %s", item['link'], e)
+            if not published:
+                # Release the claim so the article is retried on the next check
+                await asyncio.to_thread(release_article, item['article_id'])
+
+def start_pipeline(tg: asyncio.TaskGroup):
+    """Starts the worker tasks of every pipeline stage in the task group."""
+    workers = (
+        [scrape_worker] * SCRAPE_WORKERS + [dedup_worker]
+        + [process_worker] * LLM_WORKERS + [telegraph_worker] * TELEGRAPH_WORKERS
+    )
+    for worker in workers:
+        tg.create_task(worker())
+
+async def poll_batches_job():
+    """Finishes articles whose OpenAI batch has completed."""
+    pending_articles = await asyncio.to_thread(get_pending_batch_articles)
+    if not pending_articles:
+        return
 
-        except Exception as e:
-            print(f"💥 Unexpected error during processing: {e}")
-        finally:
-            print("--- Finished checking articles. ---\n")
+    batches = {}
+    for article in pending_articles:
+        batches.setdefault(article['batch_id'], []).append(article)
+
+    for batch_id, batch_articles in batches.items():
+        results = {}
+        if batch_id:
+            try:
+                results = await retrieve_batch_results(batch_id)
+            except Exception as e:
+                logger.error("❌ Error retrieving OpenAI batch %s: %s", batch_id, e)
+                continue
+            if results is None:
+                logger.info("⏳ Batch %s is still running (%s article(s))", batch_id, len(batch_articles))
+                continue
+
+        # The articles of a finished batch are published and sent for moderation concurrently
+        await asyncio.gather(*[finish_batched_article(article, results) for article in batch_articles])
+
+async def finish_batched_article(article: dict, results: dict):
+    """Finishes one article of a completed batch; errors are logged so the other articles still go through."""
+    try:
+        result = results.get(str(article['id']))
+        if result is None:
+            # Missing from the batch output (failed, expired or never submitted): process synchronously
+            logger.info("🔧 Processing article %s synchronously...", article['id'])
+            result = await process_translate_and_title(article['original_content'])
+        await finish_article(article['id'], article['original_url'], result)
+    except Exception as e:
+        logger.error("💥 Error finishing batched article %s: %s", article['id'], e)
 
 async def heartbeat():
     """Prints a heartbeat message to show the bot is running."""
-    print("💓 Heartbeat... bot is running and monitoring RSS feed")
+    logger.info("💓 Heartbeat... bot is running and monitoring RSS feed")
 
-async def scheduler_loop():
-    """Main scheduler loop that runs periodically."""
-    last_check = 0
-    last_heartbeat = 0
-    
+async def news_loop():
+    """Schedules a news check every CHECK_INTERVAL_SECONDS, however long the checks take."""
     while True:
-        current_time = time.time()
-        
-        # Check for news every CHECK_INTERVAL_SECONDS
-        if current_time - last_check >= CHECK_INTERVAL_SECONDS:
-            await check_news_job()
-            last_check = current_time
-        
-        # Heartbeat every 30 seconds
-        if current_time - last_heartbeat >= 30:
-            await heartbeat()
-            last_heartbeat = current_time
-        
-        # Sleep for 1 second to prevent busy waiting
-        await asyncio.sleep(1)
+        try:
+            check_ticks.put_nowait(None)
+        except asyncio.QueueFull:
+            logger.warning("⏳ Previous news check still running, a check is already pending")
+        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+
+async def news_check_worker():
+    """Runs the scheduled news checks one after another."""
+    while True:
+        await check_ticks.get()
+        await check_news_job()
+        check_ticks.task_done()
+
+async def heartbeat_loop():
+    """Prints a heartbeat every 30 seconds."""
+    while True:
+        await heartbeat()
+        await asyncio.sleep(30)
+
+async def batch_poll_loop():
+    """Collects OpenAI batch results every BATCH_POLL_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(BATCH_POLL_INTERVAL_SECONDS)
+        await poll_batches_job()
 
 async def main():
     """Initializes and runs the bot and the news checking scheduler."""
     init_db()
     
-    # Create tasks for the bot and the scheduler
-    bot_task = asyncio.create_task(run_bot())
-    scheduler_task = asyncio.create_task(scheduler_loop())
-    
-    # Run them concurrently
-    await asyncio.gather(
-        bot_task,
-        scheduler_task
-    )
+    # Run the bot, the pipeline workers and the periodic jobs concurrently;
+    # the task group cancels everything else if one of them fails
+    try:
+        async with asyncio.TaskGroup() as tg:
+            start_pipeline(tg)
+            tg.create_task(run_bot())
+            tg.create_task(news_loop())
+            tg.create_task(news_check_worker())
+            tg.create_task(heartbeat_loop())
+            if OPENAI_BATCH_MODE:
+                tg.create_task(batch_poll_loop())
+    finally:
+        # Runs on Ctrl+C too: asyncio.run cancels main() and waits for it before closing the loop
+        logger.info("Shutting down...")
+        await stop_bot()
 
 if __name__ == "__main__":
+    setup_logging()
+    try:
+        # uvloop is optional; it speeds up the network-bound event loop on Linux
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
-        print("\n shutting down...")
-        # Gracefully stop the bot
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(stop_bot())
-        print("Shutdown complete.")
\ No newline at end of file
+        pass
+    logger.info("Shutdown complete.")
\ No newline at end of file
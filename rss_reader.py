@@ -1,7 +1,12 @@
+import logging
+import asyncio
+import heapq
 import feedparser
 from typing import List, Dict, Optional
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 def get_latest_articles(feed_url: str, count: int = 1) -> List[Dict[str, str]]:
     """
     Fetches the latest articles from an RSS feed based on publication date.
@@ -13,21 +18,30 @@ def get_latest_articles(feed_url: str, count: int = 1) -> List[Dict[str, str]]:
     Returns:
         A list containing the most recent articles (up to 'count' items).
     """
-    feed = feedparser.parse(feed_url)
+    return _latest_entries(feedparser.parse(feed_url), count)
+
+async def get_latest_articles_async(feed_urls: List[str], count: int = 1) -> List[List[Dict[str, str]]]:
+    """
+    Fetches the latest articles from several RSS feeds concurrently.
+    get_latest_articles is blocking (feedparser), so every feed is fetched in a worker thread.
 
+    Returns:
+        One list of the most recent articles (up to 'count' items) per feed, in the order of feed_urls.
+    """
+    return await asyncio.gather(*(asyncio.to_thread(get_latest_articles, url, count) for url in feed_urls))
+
+def _latest_entries(feed, count: int) -> List[Dict[str, str]]:
+    """Picks the 'count' most recent entries of a parsed feed."""
     if feed.bozo:
-        print(f"Error parsing feed: {feed.bozo_exception}")
+        logger.error("Error parsing feed: %s", feed.bozo_exception)
         return []
 
     if not feed.entries:
-        print("No entries found in the feed.")
+        logger.info("No entries found in the feed.")
         return []
 
-    # Sort entries by publication date (most recent first)
-    sorted_entries = sorted(feed.entries, key=lambda x: x.get('published_parsed', (0,)), reverse=True)
-    
-    # Take the requested number of most recent articles
-    latest_entries = sorted_entries[:count]
+    # Take the requested number of most recent articles without sorting the whole feed
+    latest_entries = heapq.nlargest(count, feed.entries, key=lambda x: x.get('published_parsed') or (0,))
     
     articles = []
     for entry in latest_entries:
@@ -1,59 +1,128 @@
-import requests
+import logging
+import asyncio
+import httpx
 import trafilatura
-from bs4 import BeautifulSoup
-from typing import Dict, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import Dict, Optional, Tuple
 import re
 
-def scrape_article_content(url: str) -> Optional[Dict[str, str]]:
+logger = logging.getLogger(__name__)
+
+# Trailing whitespace and punctuation stripped from titles and descriptions
+_TRAILING_PUNCT = re.compile(r'[\s.,;:!?\-–—]+$')
+
+# Patterns used to clean trafilatura output and to pick its description and main image
+_RE_CODE_FENCE_OPEN = re.compile(r'```html\s*')
+_RE_CODE_FENCE_CLOSE = re.compile(r'```\s*$')
+_RE_HTML = re.compile(r'</?html[^>]*>', re.IGNORECASE)
+_RE_HEAD = re.compile(r'</?head[^>]*>', re.IGNORECASE)
+_RE_BODY = re.compile(r'</?body[^>]*>', re.IGNORECASE)
+_RE_H12_OPEN = re.compile(r'<h[12]([^>]*)>')
+_RE_H12_CLOSE = re.compile(r'</h[12]>')
+_RE_H56_OPEN = re.compile(r'<h[56]([^>]*)>')
+_RE_H56_CLOSE = re.compile(r'</h[56]>')
+_RE_EMPTY_P = re.compile(r'<p>\s*</p>')
+# A plain-text paragraph or an image source, so description and image are found in one scan
+_RE_P_TEXT_OR_IMG_SRC = re.compile(r'<p>([^<]+)</p>|<img src="([^"]+)"')
+
+# Elements removed from the article container before its content is collected
+_DROP_TAGS = frozenset(('script', 'style', 'nav', 'footer', 'aside', 'form', 'iframe', 'header'))
+_PROMO_CLASS_RE = re.compile(r'social|share|button|ad|promo|sidebar|comment|related|subscribe')
+
+# Only <body> is parsed: everything the scraper reads lives there, while <head> is mostly
+# scripts, styles and metadata. A narrower tag list would not help, since a matched
+# element keeps its whole subtree and <body> is needed as the container fallback.
+_BODY_ONLY = SoupStrainer('body')
+
+# Substrings that mark boilerplate paragraphs and non-content images
+_AARP_SKIP_WORDS = ('cookie', 'privacy', 'terms', 'subscribe', 'newsletter', 'advertisement')
+_CONTEXT_SKIP_WORDS = ('cookie', 'subscribe', 'newsletter', 'advertisement', 'menu', 'navigation')
+_IMAGE_SKIP_WORDS = ('logo', 'avatar', 'icon', 'spinner', '.gif', 'data:image')
+
+# Request headers shared by all page fetches. Accept-Encoding is left to httpx: it advertises
+# gzip and deflate, plus br and zstd when the brotli/zstd extras are installed, and decodes them.
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+    'Accept': 'text/html,application/xhtml+xml',
+}
+
+# Shared async HTTP client, so the scrape workers fetch pages concurrently without blocking the event loop.
+# Keep-alive and HTTP/2 let repeated articles from the same site reuse one connection.
+_client = httpx.AsyncClient(
+    headers=_HEADERS,
+    limits=httpx.Limits(max_connections=20),
+    timeout=15.0,
+    follow_redirects=True,
+    http2=True,
+)
+
+async def scrape_article_content(url: str, keep_raw_html: bool = False) -> Optional[Dict[str, str]]:
     """
     Scrapes the main content from a given article URL.
-    Uses custom BeautifulSoup scraper first, falls back to trafilatura if needed.
+    The page is fetched asynchronously; parsing runs in a worker thread.
+    The fetched HTML is only returned (as 'raw_html') with keep_raw_html, since it can be megabytes.
     """
     try:
         # Fetch the webpage
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
+        response = await _client.get(url)
         response.raise_for_status()
         raw_html = response.text
-        
-        print(f"📄 Fetched {len(raw_html)} chars of HTML from {url}")
-        
+    except httpx.HTTPError as e:
+        logger.error("❌ Error fetching URL %s: %s", url, e)
+        return None
+
+    logger.info("📄 Fetched %s chars of HTML from %s", len(raw_html), url)
+    result = await asyncio.to_thread(extract_article_content, raw_html, url)
+    if result and keep_raw_html:
+        result['raw_html'] = raw_html
+    return result
+
+def extract_article_content(raw_html: str, url: str) -> Optional[Dict[str, str]]:
+    """
+    Extracts the main content from the HTML of an article.
+    Uses custom BeautifulSoup scraper first, falls back to trafilatura if needed.
+    """
+    try:
         # Try our custom scraper first (it worked better!)
         result = scrape_with_beautifulsoup(raw_html, url)
         if result:
-            print(f"✅ Custom scraper extracted content successfully")
-            result['raw_html'] = raw_html
+            logger.info("✅ Custom scraper extracted content successfully")
             return result
         
         # Fallback to trafilatura
-        print("⚠️ Custom scraper failed, trying trafilatura...")
+        logger.warning("⚠️ Custom scraper failed, trying trafilatura...")
         result = scrape_with_trafilatura(raw_html, url)
         if result:
-            print(f"✅ Trafilatura extracted content successfully")
-            result['raw_html'] = raw_html
+            logger.info("✅ Trafilatura extracted content successfully")
             return result
         
-        print(f"❌ Both scrapers failed to extract content from {url}")
+        logger.error("❌ Both scrapers failed to extract content from %s", url)
         return None
         
-    except requests.RequestException as e:
-        print(f"❌ Error fetching URL {url}: {e}")
-        return None
     except Exception as e:
-        print(f"❌ Error processing content from {url}: {e}")
+        logger.error("❌ Error processing content from %s: %s", url, e)
         return None
 
+def _is_boilerplate(element) -> bool:
+    """Checks whether an element is a script, navigation, ad or other non-content block."""
+    if element.name in _DROP_TAGS:
+        return True
+    classes = element.get('class')
+    # Same as the [class*="..."] selectors: a substring match on the whole class attribute
+    return bool(classes) and _PROMO_CLASS_RE.search(' '.join(classes)) is not None
+
 def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str]]:
     """
     Our original BeautifulSoup scraper that worked well.
     """
     try:
-        soup = BeautifulSoup(raw_html, 'html.parser')
+        soup = BeautifulSoup(raw_html, 'lxml', parse_only=_BODY_ONLY)
 
         # --- Title Extraction ---
         title_tag = soup.find('h1')
         title = title_tag.get_text(strip=True) if title_tag else "No Title Found"
         # Clean title from punctuation
-        title = title.rstrip('.,;:!?-–—').strip()
+        title = _TRAILING_PUNCT.sub('', title)
 
         # --- Content Container Identification ---
         article_body = (
@@ -67,7 +136,7 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
         )
 
         if not article_body:
-            print(f"Could not find a suitable article container on {url}, using <body> as fallback.")
+            logger.warning("Could not find a suitable article container on %s, using <body> as fallback.", url)
             article_body = soup.find('body')
             if not article_body:
                 return None
@@ -75,30 +144,23 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
         # For AARP articles, collect ALL paragraphs from the entire page to avoid missing content
         all_paragraphs = []
         if 'aarp.org' in url:
-            print("🔍 AARP site detected - collecting all paragraphs from entire page")
+            logger.info("🔍 AARP site detected - collecting all paragraphs from entire page")
             # Get all paragraphs from the entire document
             for p in soup.find_all('p'):
                 text = p.get_text(strip=True)
                 if (len(text) > 30 and  # Substantial content
-                    not any(skip in text.lower() for skip in ['cookie', 'privacy', 'terms', 'subscribe', 'newsletter', 'advertisement']) and
+                    not any(skip in text.lower() for skip in _AARP_SKIP_WORDS) and
                     not p.find_parent(['nav', 'footer', 'aside', 'header'])):  # Not in navigation/footer
                     all_paragraphs.append(p)
-            print(f"📊 Found {len(all_paragraphs)} paragraphs across entire page")
+            logger.info("📊 Found %s paragraphs across entire page", len(all_paragraphs))
 
-        # --- Pre-cleaning of the article body ---
-        for element in article_body(['script', 'style', 'nav', 'footer', 'aside', 'form', 'iframe', 'header']):
-            element.decompose()
-        
-        promotional_selectors = [
-            '[class*="social"]', '[class*="share"]', '[class*="button"]', '[class*="ad"]', '[class*="promo"]',
-            '[class*="sidebar"]', '[class*="comment"]', '[class*="related"]', '[class*="subscribe"]'
-        ]
-        for selector in promotional_selectors:
-            for element in article_body.select(selector):
+        # --- Pre-cleaning of the article body (a single pass over its elements) ---
+        for element in article_body.find_all(_is_boilerplate):
+            if not element.decomposed:  # Already removed together with a boilerplate ancestor
                 element.decompose()
 
         # --- Rebuild content HTML, preserving order ---
-        content_html = ""
+        content_parts = []
         short_description = ""
         seen_images = set()
         main_image_url = None
@@ -108,11 +170,12 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
         
         # For AARP, add all paragraphs from entire page to ensure complete content
         if 'aarp.org' in url and all_paragraphs:
-            # Add paragraphs that aren't already in the main container
+            # Add paragraphs that aren't already in the main container (by identity, Tag equality compares whole subtrees)
+            in_container = {id(element) for element in elements_to_process}
             for p in all_paragraphs:
-                if p not in elements_to_process:
+                if id(p) not in in_container:
                     elements_to_process.append(p)
-            print(f"📝 Processing {len(elements_to_process)} total elements (including page-wide paragraphs)")
+            logger.info("📝 Processing %s total elements (including page-wide paragraphs)", len(elements_to_process))
         
         for element in elements_to_process:
             if element.name in ['p', 'h1', 'h2', 'h3']:
@@ -123,10 +186,10 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
                 if element.name == 'p' and not short_description:
                     desc = text[:300] if len(text) > 300 else text
                     # Clean punctuation from end
-                    desc = desc.rstrip('.,;:!?-–—').strip()
+                    desc = _TRAILING_PUNCT.sub('', desc)
                     short_description = desc + ('...' if len(text) > 300 else '')
 
-                content_html += f"<{element.name}>{text}</{element.name}>\n\n"
+                content_parts.append(f"<{element.name}>{text}</{element.name}>\n\n")
 
             elif element.name in ['img', 'figure']:
                 img_tag = element if element.name == 'img' else element.find('img')
@@ -138,14 +201,15 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
                 if not img_src or not img_src.startswith('http') or img_src in seen_images:
                     continue
                 
-                if any(skip in img_src.lower() for skip in ['logo', 'avatar', 'icon', 'spinner', '.gif', 'data:image']):
+                if any(skip in img_src.lower() for skip in _IMAGE_SKIP_WORDS):
                     continue
 
-                content_html += f'<img src="{img_src}">\n\n'
+                content_parts.append(f'<img src="{img_src}">\n\n')
                 seen_images.add(img_src)
                 if not main_image_url:
                     main_image_url = img_src
 
+        content_html = "".join(content_parts)
         if not content_html.strip():
             return None
             
@@ -166,7 +230,7 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
             for elem in all_text_elements:
                 text = elem.get_text(strip=True)
                 if (len(text) > 50 and 
-                    not any(skip in text.lower() for skip in ['cookie', 'subscribe', 'newsletter', 'advertisement', 'menu', 'navigation'])):
+                    not any(skip in text.lower() for skip in _CONTEXT_SKIP_WORDS)):
                     additional_paragraphs.append(f"<{elem.name}>{text}</{elem.name}>")
             additional_context = "\n".join(additional_paragraphs[:20])  # Limit to first 20 elements
 
@@ -179,7 +243,7 @@ def scrape_with_beautifulsoup(raw_html: str, url: str) -> Optional[Dict[str, str
         }
         
     except Exception as e:
-        print(f"BeautifulSoup scraper error: {e}")
+        logger.error("BeautifulSoup scraper error: %s", e)
         return None
 
 def scrape_with_trafilatura(raw_html: str, url: str) -> Optional[Dict[str, str]]:
@@ -213,14 +277,13 @@ def scrape_with_trafilatura(raw_html: str, url: str) -> Optional[Dict[str, str]]
             title = metadata.title.strip()
         
         # Clean title from punctuation
-        title = title.rstrip('.,;:!?-–—').strip()
+        title = _TRAILING_PUNCT.sub('', title)
         
         # Clean HTML for Telegraph
         cleaned_html = clean_trafilatura_html(content_html)
         
         # Extract short description and main image
-        short_description = extract_short_description_from_html(cleaned_html)
-        main_image_url = extract_main_image_from_html(cleaned_html)
+        short_description, main_image_url = extract_description_and_image_from_html(cleaned_html)
         
         return {
             'title': title,
@@ -231,7 +294,7 @@ def scrape_with_trafilatura(raw_html: str, url: str) -> Optional[Dict[str, str]]
         }
         
     except Exception as e:
-        print(f"Trafilatura scraper error: {e}")
+        logger.error("Trafilatura scraper error: %s", e)
         return None
 
 def clean_trafilatura_html(html_content: str) -> str:
@@ -240,41 +303,44 @@ def clean_trafilatura_html(html_content: str) -> str:
         return ""
     
     # Remove markdown code blocks that trafilatura sometimes adds
-    html_content = re.sub(r'```html\s*', '', html_content)
-    html_content = re.sub(r'```\s*$', '', html_content)
+    html_content = _RE_CODE_FENCE_OPEN.sub('', html_content)
+    html_content = _RE_CODE_FENCE_CLOSE.sub('', html_content)
     
     # Remove document structure tags
-    html_content = re.sub(r'</?html[^>]*>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'</?head[^>]*>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'</?body[^>]*>', '', html_content, flags=re.IGNORECASE)
+    html_content = _RE_HTML.sub('', html_content)
+    html_content = _RE_HEAD.sub('', html_content)
+    html_content = _RE_BODY.sub('', html_content)
     
     # Convert headers to Telegraph format
-    html_content = re.sub(r'<h[12]([^>]*)>', r'<h3\1>', html_content)
-    html_content = re.sub(r'</h[12]>', r'</h3>', html_content)
-    html_content = re.sub(r'<h[56]([^>]*)>', r'<h4\1>', html_content)
-    html_content = re.sub(r'</h[56]>', r'</h4>', html_content)
+    html_content = _RE_H12_OPEN.sub(r'<h3\1>', html_content)
+    html_content = _RE_H12_CLOSE.sub('</h3>', html_content)
+    html_content = _RE_H56_OPEN.sub(r'<h4\1>', html_content)
+    html_content = _RE_H56_CLOSE.sub('</h4>', html_content)
     
     # Clean up
-    html_content = re.sub(r'<p>\s*</p>', '', html_content)
+    html_content = _RE_EMPTY_P.sub('', html_content)
     html_content = html_content.strip()
     
     return html_content
 
-def extract_short_description_from_html(content_html: str) -> str:
-    """Extract short description from HTML."""
-    p_matches = re.findall(r'<p>([^<]+)</p>', content_html)
-    for p_text in p_matches:
-        if len(p_text.strip()) > 50:
-            desc = p_text.strip()[:300]
-            desc = desc.rstrip('.,;:!?-–—').strip()
-            return desc + ('...' if len(p_text) > 300 else '')
-    return ""
-
-def extract_main_image_from_html(content_html: str) -> Optional[str]:
-    """Extract main image from HTML."""
-    img_match = re.search(r'<img src="([^"]+)"', content_html)
-    if img_match:
-        img_url = img_match.group(1)
-        if not any(skip in img_url.lower() for skip in ['logo', 'avatar', 'icon', 'spinner', '.gif']):
-            return img_url
-    return None
\ No newline at end of file
+def extract_description_and_image_from_html(content_html: str) -> Tuple[str, Optional[str]]:
+    """
+    Extracts the short description (first substantial paragraph) and the main image
+    (the first image, unless it looks like a logo or icon) from HTML in a single pass.
+    """
+    short_description = None
+    main_image_url = None
+    image_checked = False
+    for match in _RE_P_TEXT_OR_IMG_SRC.finditer(content_html):
+        p_text, img_url = match.groups()
+        if p_text is not None:
+            if short_description is None and len(p_text.strip()) > 50:
+                desc = _TRAILING_PUNCT.sub('', p_text.strip()[:300])
+                short_description = desc + ('...' if len(p_text) > 300 else '')
+        elif not image_checked:
+            image_checked = True
+            if not any(skip in img_url.lower() for skip in _IMAGE_SKIP_WORDS):
+                main_image_url = img_url
+        if short_description is not None and image_checked:
+            break
+    return short_description or "", main_image_url
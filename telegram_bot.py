@@ -1,12 +1,51 @@
+import logging
 import asyncio
+import html
 import httpx
+from functools import lru_cache
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from config import TELEGRAM_BOT_TOKEN, PUBLISH_NEWS_CHANNEL_ID, PREVIEW_NEWS_CHANNEL_ID, MAKE_WEBHOOK_URL
+from cachetools import TTLCache
 from ai_handler import generate_facebook_post
+from database import get_article_by_id
+from log_config import setup_logging
 
-# Initialize the bot application
-application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+logger = logging.getLogger(__name__)
+
+# Articles are sent for moderation concurrently; keep the number of in-flight sends
+# well within Telegram's limit of about 30 messages per second
+_moderation_semaphore = asyncio.Semaphore(20)
+
+# Shared client for the Make.com webhook, so publications reuse one keep-alive connection.
+# Created by run_bot and closed by stop_bot.
+_webhook_client: httpx.AsyncClient | None = None
+
+# Articles looked up by the publish callback. A finished article (one with a Telegraph page) no longer changes,
+# so repeated presses (timeouts, retries) don't need to hit the database again; it is evicted once published.
+_article_cache = TTLCache(maxsize=256, ttl=300)
+
+# Closing text of the source link in moderation messages; the publish callback cuts the message at it
+SOURCE_LINK_END = 'Джерело</a>'
+
+# Формат: Заголовок (з посиланням на Telegraph)
+# Короткий опис
+# Джерело
+_format_moderation_message = ("<b>{title}</b>\n\n{description}\n\n<a href='{url}'>" + SOURCE_LINK_END).format
+
+
+async def get_article_cached(article_id: int) -> dict | None:
+    """
+    Returns the article from the cache, loading it from the database on a miss.
+    Only finished articles are cached, so a missing or still unfinished row is read again on the next press.
+    """
+    article = _article_cache.get(article_id)
+    if article is None:
+        # The SQLite query runs in a worker thread so the bot keeps handling other updates
+        article = await asyncio.to_thread(get_article_by_id, article_id)
+        if article and article.get('telegraph_url'):
+            _article_cache[article_id] = article
+    return article
 
 async def send_for_moderation(title: str, short_description: str, original_url: str, article_id: int):
     """Sends a message with embedded Telegraph link and a 'Publish' button to the moderation channel."""
@@ -15,50 +54,128 @@ async def send_for_moderation(title: str, short_description: str, original_url:
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    print("📝 Using AI-generated title and description with embedded link")
+    logger.info("📝 Using AI-generated title and description with embedded link")
     
-    # Title and description already have embedded Telegraph links from AI
-    # Формат: Заголовок (з посиланням на Telegraph)
-    # Короткий опис
-    # Джерело
-    message_text = f"<b>{title}</b>\n\n{short_description}\n\n<a href='{original_url}'>Джерело</a>"
-
-    await application.bot.send_message(
-        chat_id=PREVIEW_NEWS_CHANNEL_ID,
-        text=message_text,
-        reply_markup=reply_markup,
-        parse_mode='HTML',
-        disable_web_page_preview=False
-    )
-    print(f"Sent article '{title}' for moderation.")
+    # The title and description arrive as HTML with their text escaped; the URL goes into an attribute
+    message_text = _format_moderation_message(title=title, description=short_description, url=html.escape(original_url))
+
+    async with _moderation_semaphore:
+        await get_application().bot.send_message(
+            chat_id=PREVIEW_NEWS_CHANNEL_ID,
+            text=message_text,
+            reply_markup=reply_markup,
+            parse_mode='HTML',
+            disable_web_page_preview=False
+        )
+    logger.info("Sent article '%s' for moderation.", title)
+
+def _retry_after_seconds(response: httpx.Response) -> float:
+    """Returns the delay requested by a 429 response's Retry-After header (1s if missing or an HTTP date), capped at a minute."""
+    try:
+        delay = float(response.headers.get('Retry-After', 1))
+    except ValueError:
+        delay = 1.0
+    return min(max(delay, 0.0), 60.0)
+
+async def send_publication_webhook(sent_message, article: dict):
+    """Sends the published article's Facebook post and Telegram link to the Make.com webhook."""
+    try:
+        # 1. Get Telegram post link
+        if sent_message.chat.username:
+            post_url = f"https://t.me/{sent_message.chat.username}/{sent_message.message_id}"
+        else:
+            # For private channels, chat_id is a negative number.
+            # The link format is t.me/c/channel_id/message_id
+            # so the "-100" prefix is sliced off instead of searched for
+            chat_id = sent_message.chat.id
+            chat_id_str = str(-chat_id)[3:] if chat_id < 0 else str(chat_id)
+            post_url = f"https://t.me/c/{chat_id_str}/{sent_message.message_id}"
+
+        logger.info("🔗 Generated Telegram post link: %s", post_url)
+
+        # 2. Generate Facebook post content from the processed article content
+        article_content = article.get('translated_content', '')
+
+        if not article_content:
+            logger.warning("⚠️ Article %s has no content. AI generation might be inaccurate.", article['id'])
+
+        logger.info("🤖 Generating Facebook post...")
+        facebook_post_text = await generate_facebook_post(article_content)
+        logger.info("✅ Facebook post generated")
+
+        # 3. Send webhook to Make.com with timeout
+        webhook_payload = {
+            "facebook_post": facebook_post_text, # The AI prompt already includes the call to action
+            "telegram_post_url": post_url
+        }
+
+        # Add image_url only if it exists
+        image_url = article.get('image_url')
+        if image_url:
+            webhook_payload["image_url"] = image_url
+            logger.info("🖼️ Including image URL: %s", image_url)
+        else:
+            logger.info("📷 No image found for this article")
+
+        logger.info("📦 Sending webhook to Make.com...")
+
+        response = await _webhook_client.post(MAKE_WEBHOOK_URL, json=webhook_payload)
+        if response.status_code == 429:
+            # Make.com is throttling us; wait as long as it asks and retry once on the same connection
+            delay = _retry_after_seconds(response)
+            logger.warning("⏳ Webhook rate limited by Make.com, retrying in %ss", delay)
+            await asyncio.sleep(delay)
+            response = await _webhook_client.post(MAKE_WEBHOOK_URL, json=webhook_payload)
+        response.raise_for_status() # Raise an exception for bad status codes
+
+        logger.info("✅ Successfully sent webhook to Make.com. Status: %s", response.status_code)
+
+    except httpx.TimeoutException as e:
+        logger.warning("⚠️ Webhook timeout (Make.com took too long): %s", e)
+    except httpx.RequestError as e:
+        logger.error("❌ Error sending webhook to Make.com: %s", e)
+    except Exception as e:
+        logger.error("❌ An unexpected error occurred in the webhook logic: %s", e)
+
+async def mark_published_in_moderation(query):
+    """Marks the moderation message as published."""
+    # Edit the original message in the moderation channel (with error handling)
+    try:
+        await query.edit_message_text(
+            text=f"{query.message.text_html}\n\n<b>✅ Опубліковано</b>",
+            parse_mode='HTML',
+            disable_web_page_preview=False
+        )
+    except Exception as e:
+        logger.warning("⚠️ Could not edit moderation message (probably timeout): %s", e)
+        logger.info("✅ Article was published successfully despite the error")
 
 async def handle_publish_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handles the 'Publish' button callback."""
-    print(f"🔔 Received callback: {update.callback_query.data}")
+    logger.info("🔔 Received callback: %s", update.callback_query.data)
     query = update.callback_query
     
     try:
         await query.answer()
     except Exception as e:
         if "too old" in str(e) or "timeout expired" in str(e):
-            print("⚠️ Callback query is too old, but continuing with publication...")
+            logger.warning("⚠️ Callback query is too old, but continuing with publication...")
         else:
-            print(f"❌ Error answering callback: {e}")
+            logger.error("❌ Error answering callback: %s", e)
             return
 
     # Extract the article ID from the callback data
     callback_data = query.data
-    print(f"📋 Processing callback data: {callback_data}")
+    logger.info("📋 Processing callback data: %s", callback_data)
     if callback_data.startswith("pub_"):
         try:
             article_id = int(callback_data.replace("pub_", ""))
             
             # Get the Telegraph URL from database
-            from database import get_article_by_id
-            article = get_article_by_id(article_id)
+            article = await get_article_cached(article_id)
             
             if not article or not article.get('telegraph_url'):
-                print(f"Article {article_id} not found or has no Telegraph URL")
+                logger.warning("Article %s not found or has no Telegraph URL", article_id)
                 try:
                     await query.edit_message_text(
                         text=f"{query.message.text_html}\n\n<b>❌ Помилка: стаття не знайдена</b>",
@@ -66,7 +183,7 @@ async def handle_publish_callback(update: Update, context: ContextTypes.DEFAULT_
                         disable_web_page_preview=False
                     )
                 except Exception as e:
-                    print(f"⚠️ Could not edit message: {e}")
+                    logger.warning("⚠️ Could not edit message: %s", e)
                 return
             
             telegraph_url = article['telegraph_url']
@@ -74,93 +191,32 @@ async def handle_publish_callback(update: Update, context: ContextTypes.DEFAULT_
             # Отримуємо оригінальний текст з повідомлення модерації
             original_text = query.message.text_html
             
-            # Видаляємо "Джерело" з кінця (останній рядок з посиланням)
-            lines = original_text.split('\n')
-            # Знаходимо останній рядок з "Джерело" і видаляємо його
-            filtered_lines = []
-            for line in lines:
-                if not ('<a href=' in line and 'Джерело</a>' in line):
-                    filtered_lines.append(line)
-            
-            # Формуємо фінальний текст для публікації
-            publish_text = '\n'.join(filtered_lines).strip()
+            # Видаляємо "Джерело" з кінця (останній рядок з посиланням) і формуємо фінальний текст для публікації
+            source_index = original_text.rfind(SOURCE_LINK_END)
+            if source_index != -1:
+                line_start = original_text.rfind('\n', 0, source_index)
+                publish_text = original_text[:max(line_start, 0)].strip()
+            else:
+                publish_text = original_text.strip()
             
             # Send the formatted message to the public channel
-            sent_message = await application.bot.send_message(
+            sent_message = await get_application().bot.send_message(
                 chat_id=PUBLISH_NEWS_CHANNEL_ID,
                 text=publish_text,
                 parse_mode='HTML',
                 disable_web_page_preview=False
             )
-            print(f"✅ Published article: {telegraph_url}")
+            logger.info("✅ Published article: %s", telegraph_url)
+            _article_cache.pop(article_id, None)
             
-            # --- Start Webhook Logic (async, with timeout protection) ---
+            # The webhook (Facebook post generation + POST) and the moderation message update are independent
+            tasks = [mark_published_in_moderation(query)]
             if MAKE_WEBHOOK_URL:
-                try:
-                    # 1. Get Telegram post link
-                    if sent_message.chat.username:
-                        post_url = f"https://t.me/{sent_message.chat.username}/{sent_message.message_id}"
-                    else:
-                        # For private channels, chat_id is a negative number.
-                        # The link format is t.me/c/channel_id/message_id
-                        chat_id_str = str(sent_message.chat.id).replace("-100", "")
-                        post_url = f"https://t.me/c/{chat_id_str}/{sent_message.message_id}"
-                    
-                    print(f"🔗 Generated Telegram post link: {post_url}")
-                    
-                    # 2. Generate Facebook post content from the processed article content
-                    article_content = article.get('translated_content', '')
-                    
-                    if not article_content:
-                        print(f"⚠️ Warning: Article {article_id} has no content. AI generation might be inaccurate.")
-
-                    print(f"🤖 Generating Facebook post...")
-                    facebook_post_text = generate_facebook_post(article_content)
-                    print(f"✅ Facebook post generated")
-
-                    # 3. Send webhook to Make.com with timeout
-                    webhook_payload = {
-                        "facebook_post": facebook_post_text, # The AI prompt already includes the call to action
-                        "telegram_post_url": post_url
-                    }
-                    
-                    # Add image_url only if it exists
-                    image_url = article.get('image_url')
-                    if image_url:
-                        webhook_payload["image_url"] = image_url
-                        print(f"🖼️ Including image URL: {image_url}")
-                    else:
-                        print(f"📷 No image found for this article")
-                    
-                    print(f"📦 Sending webhook to Make.com...")
-
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response = await client.post(MAKE_WEBHOOK_URL, json=webhook_payload)
-                        response.raise_for_status() # Raise an exception for bad status codes
-                    
-                    print(f"✅ Successfully sent webhook to Make.com. Status: {response.status_code}")
-
-                except httpx.TimeoutException as e:
-                    print(f"⚠️ Webhook timeout (Make.com took too long): {e}")
-                except httpx.RequestError as e:
-                    print(f"❌ Error sending webhook to Make.com: {e}")
-                except Exception as e:
-                    print(f"❌ An unexpected error occurred in the webhook logic: {e}")
-            # --- End Webhook Logic ---
-
-            # Edit the original message in the moderation channel (with error handling)
-            try:
-                await query.edit_message_text(
-                    text=f"{query.message.text_html}\n\n<b>✅ Опубліковано</b>",
-                    parse_mode='HTML',
-                    disable_web_page_preview=False
-                )
-            except Exception as e:
-                print(f"⚠️ Could not edit moderation message (probably timeout): {e}")
-                print("✅ Article was published successfully despite the error")
+                tasks.append(send_publication_webhook(sent_message, article))
+            await asyncio.gather(*tasks)
 
         except ValueError:
-            print(f"Invalid article ID in callback data: {callback_data}")
+            logger.warning("Invalid article ID in callback data: %s", callback_data)
             try:
                 await query.edit_message_text(
                     text=f"{query.message.text_html}\n\n<b>❌ Помилка: невірний ID статті</b>",
@@ -168,11 +224,9 @@ async def handle_publish_callback(update: Update, context: ContextTypes.DEFAULT_
                     disable_web_page_preview=False
                 )
             except Exception as e:
-                print(f"⚠️ Could not edit message: {e}")
+                logger.warning("⚠️ Could not edit message: %s", e)
         except Exception as e:
-            print(f"❌ Error during publishing: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error during publishing: %s", e)
             try:
                 await query.edit_message_text(
                     text=f"{query.message.text_html}\n\n<b>❌ Помилка публікації</b>",
@@ -180,43 +234,65 @@ async def handle_publish_callback(update: Update, context: ContextTypes.DEFAULT_
                     disable_web_page_preview=False
                 )
             except Exception as edit_error:
-                print(f"⚠️ Could not edit message: {edit_error}")
+                logger.warning("⚠️ Could not edit message: %s", edit_error)
 
-# Add the callback handler to the application
-application.add_handler(CallbackQueryHandler(handle_publish_callback, pattern=r'^pub_'))
+@lru_cache(maxsize=1)
+def get_application() -> Application:
+    """Builds the bot application and registers its handlers on first use."""
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application.add_handler(CallbackQueryHandler(handle_publish_callback, pattern=r'^pub_'))
+    return application
 
 async def run_bot():
     """Starts the bot to listen for callbacks."""
-    print("🤖 Initializing Telegram bot...")
+    global _webhook_client
+    if MAKE_WEBHOOK_URL:
+        _webhook_client = httpx.AsyncClient(timeout=30.0, limits=httpx.Limits(max_keepalive_connections=4))
+
+    application = get_application()
+    logger.info("🤖 Initializing Telegram bot...")
     await application.initialize()
 
     # Delete any existing webhook to ensure polling works
-    print("🗑️  Checking for and deleting any existing webhook...")
+    logger.info("🗑️  Checking for and deleting any existing webhook...")
     if await application.bot.delete_webhook():
-        print("✅ Webhook deleted successfully.")
+        logger.info("✅ Webhook deleted successfully.")
     else:
-        print("ℹ️  No webhook was active.")
+        logger.info("ℹ️  No webhook was active.")
 
-    print("🚀 Starting Telegram bot...")
+    logger.info("🚀 Starting Telegram bot...")
     await application.start()
-    print("📡 Starting polling for updates...")
-    await application.updater.start_polling(poll_interval=1, timeout=30)
-    print("✅ Telegram bot is running and listening for callbacks!")
+    logger.info("📡 Starting polling for updates...")
+    # Long polling: Telegram holds each getUpdates request for up to 50s, so the next one can follow immediately
+    await application.updater.start_polling(poll_interval=0.0, timeout=50, bootstrap_retries=-1)
+    logger.info("✅ Telegram bot is running and listening for callbacks!")
 
 async def stop_bot():
     """Stops the bot gracefully."""
-    await application.updater.stop()
-    await application.stop()
+    application = get_application()
+    # The bot may not have started at all if the program failed early
+    if application.updater.running:
+        await application.updater.stop()
+    if application.running:
+        await application.stop()
     await application.shutdown()
-    print("Telegram bot stopped.")
+    if _webhook_client:
+        await _webhook_client.aclose()
+    logger.info("Telegram bot stopped.")
+
+async def _run_until_stopped():
+    await run_bot()
+    # Keep it running until manually stopped
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_bot()
 
 if __name__ == '__main__':
     # For testing the bot independently
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(run_bot())
-    # Keep it running until manually stopped
+    setup_logging()
     try:
-        loop.run_forever()
+        asyncio.run(_run_until_stopped())
     except KeyboardInterrupt:
-        loop.run_until_complete(stop_bot())
+        pass
 
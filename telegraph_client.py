@@ -1,49 +1,82 @@
+import logging
+import hashlib
+import threading
 from telegraph import Telegraph
+from cachetools import LRUCache
 from config import TELEGRAPH_ACCESS_TOKEN
 from typing import Optional
 import re
 
+logger = logging.getLogger(__name__)
+
 # Initialize the Telegraph client
 telegraph = Telegraph(access_token=TELEGRAPH_ACCESS_TOKEN)
 
+# Patterns of clean_html_for_telegraph, compiled once
+_RE_DOCUMENT_TAGS = re.compile(r'</?(?:html|head|body|doctype)[^>]*>', re.IGNORECASE)
+# Opening and closing h1/h2 and h5/h6 tags, mapped to the closest heading Telegraph supports
+_RE_HEADING = re.compile(r'<(/?)h([1256])([^>]*)>')
+_HEADING_LEVELS = {'1': '3', '2': '3', '5': '4', '6': '4'}
+# Telegraph doesn't support these tags; they are removed but their content is kept
+_UNSUPPORTED_TAGS = ('div', 'span', 'section', 'article', 'header', 'footer', 'nav', 'aside', 'main', 'figure', 'figcaption')
+_RE_UNSUPPORTED = re.compile(r'</?(?:' + '|'.join(_UNSUPPORTED_TAGS) + r')\b[^>]*>', re.IGNORECASE)
+_RE_SUPPORTED_ATTRS = re.compile(r'<(p|h3|h4|strong|em|u|s|code|pre|blockquote|br)\s+[^>]*>', re.IGNORECASE)
+_RE_IMG = re.compile(r'<img[^>]*src="([^"]*)"[^>]*>', re.IGNORECASE)
+# Empty paragraphs, including ones holding a single &nbsp;
+_RE_EMPTY_P = re.compile(r'<p>\s*(?:&nbsp;\s*)?</p>', re.IGNORECASE)
+# Anything clean_html_for_telegraph would rewrite: a tag other than an attribute-less supported tag or a link
+# (images always go through the cleanup), an empty paragraph, or whitespace other than single spaces
+_RE_NEEDS_CLEANUP = re.compile(
+    r'<(?!/?(?:p|br|strong|em|u|s|code|pre|blockquote|h3|h4)>|br/>|a[\s>]|/a>)'
+    r'|<p>\s*(?:&nbsp;\s*)?</p>'
+    r'|\s\s|[^\S ]',
+    re.IGNORECASE
+)
+
 def clean_html_for_telegraph(html_content: str) -> str:
     """
     Cleans HTML content to be compatible with Telegraph.
     Telegraph only supports: p, br, strong, em, u, s, code, pre, blockquote, h3, h4, img, a
     """
+    # AI-produced HTML usually conforms already; one scan then replaces all the substitutions below
+    if not _RE_NEEDS_CLEANUP.search(html_content):
+        return html_content.strip()
+
     # Remove document structure tags (html, head, body, etc.)
-    html_content = re.sub(r'</?html[^>]*>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'</?head[^>]*>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'</?body[^>]*>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'</?doctype[^>]*>', '', html_content, flags=re.IGNORECASE)
-    
-    # Convert h1 and h2 to h3 (Telegraph doesn't support h1, h2)
-    html_content = re.sub(r'<h[12]([^>]*)>', r'<h3\1>', html_content)
-    html_content = re.sub(r'</h[12]>', r'</h3>', html_content)
+    html_content = _RE_DOCUMENT_TAGS.sub('', html_content)
     
-    # Convert h5, h6 to h4
-    html_content = re.sub(r'<h[56]([^>]*)>', r'<h4\1>', html_content)
-    html_content = re.sub(r'</h[56]>', r'</h4>', html_content)
+    # Convert h1 and h2 to h3 and h5, h6 to h4 (Telegraph only supports h3, h4)
+    html_content = _RE_HEADING.sub(lambda m: f'<{m[1]}h{_HEADING_LEVELS[m[2]]}{m[3]}>', html_content)
     
-    # Remove any other unsupported tags but keep their content
-    unsupported_tags = ['div', 'span', 'section', 'article', 'header', 'footer', 'nav', 'aside', 'main', 'figure', 'figcaption']
-    for tag in unsupported_tags:
-        html_content = re.sub(f'<{tag}[^>]*>', '', html_content, flags=re.IGNORECASE)
-        html_content = re.sub(f'</{tag}>', '', html_content, flags=re.IGNORECASE)
+    # Remove any other unsupported tags but keep their content (a single pass for all of them)
+    html_content = _RE_UNSUPPORTED.sub('', html_content)
     
     # Remove attributes from supported tags (Telegraph doesn't like attributes)
-    html_content = re.sub(r'<(p|h3|h4|strong|em|u|s|code|pre|blockquote|br)\s+[^>]*>', r'<\1>', html_content, flags=re.IGNORECASE)
+    html_content = _RE_SUPPORTED_ATTRS.sub(r'<\1>', html_content)
     
     # Clean img tags - keep only src attribute
-    html_content = re.sub(r'<img[^>]*src="([^"]*)"[^>]*>', r'<img src="\1">', html_content, flags=re.IGNORECASE)
+    html_content = _RE_IMG.sub(r'<img src="\1">', html_content)
     
     # Remove empty paragraphs and extra whitespace
-    html_content = re.sub(r'<p>\s*</p>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'<p>\s*&nbsp;\s*</p>', '', html_content, flags=re.IGNORECASE)
-    html_content = re.sub(r'\s+', ' ', html_content)  # Normalize whitespace
-    html_content = re.sub(r'\n\s*\n', '\n', html_content)  # Remove extra newlines
-    
-    return html_content.strip()
+    html_content = _RE_EMPTY_P.sub('', html_content)
+    # Normalize whitespace in one pass; this also drops blank lines and leading/trailing whitespace
+    return ' '.join(html_content.split())
+
+# Cleaned HTML by the blake2b hash of the raw HTML, so a page retried with the same content isn't cleaned again.
+# create_telegraph_page runs in worker threads, hence the lock.
+_cleaned_html_cache = LRUCache(maxsize=64)
+_cleaned_html_lock = threading.Lock()
+
+def clean_html_cached(html_content: str) -> str:
+    """Returns clean_html_for_telegraph(html_content), reusing the result for content cleaned before."""
+    key = hashlib.blake2b(html_content.encode('utf-8'), digest_size=16).digest()
+    with _cleaned_html_lock:
+        cleaned = _cleaned_html_cache.get(key)
+    if cleaned is None:
+        cleaned = clean_html_for_telegraph(html_content)
+        with _cleaned_html_lock:
+            _cleaned_html_cache[key] = cleaned
+    return cleaned
 
 def create_telegraph_page(title: str, content_html: str) -> Optional[str]:
     """
@@ -58,8 +91,8 @@ def create_telegraph_page(title: str, content_html: str) -> Optional[str]:
     """
     try:
         # Clean HTML content for Telegraph compatibility
-        cleaned_html = clean_html_for_telegraph(content_html)
-        print(f"📄 Creating Telegraph page with {len(cleaned_html)} chars of cleaned HTML")
+        cleaned_html = clean_html_cached(content_html)
+        logger.info("📄 Creating Telegraph page with %s chars of cleaned HTML", len(cleaned_html))
         
         # You can optionally specify an author_name and author_url
         response = telegraph.create_page(
@@ -69,5 +102,5 @@ def create_telegraph_page(title: str, content_html: str) -> Optional[str]:
         )
         return response['url']
     except Exception as e:
-        print(f"Error creating Telegraph page: {e}")
+        logger.error("Error creating Telegraph page: %s", e)
         return None
@@ -1,71 +1,87 @@
+import logging
 import asyncio
-import sqlite3
-from telegram_bot import send_for_moderation, application
+from telegram.error import RetryAfter
+from database import get_recent_published_articles
+from telegram_bot import send_for_moderation, get_application
+from log_config import setup_logging
 
-async def main():
+logger = logging.getLogger(__name__)
+
+# Column positions in the rows returned by get_recent_published_articles
+ID, TITLE, URL, TG_URL, CONTENT = range(5)
+
+async def resend_articles():
     """
     Fetches the last 5 articles from the database and resends them for moderation.
     """
-    print("Initializing Telegram bot application for the test sender...")
-    # Initialize the telegram bot application, required for send_for_moderation
-    await application.initialize()
-
-    # Connect to the database
-    conn = sqlite3.connect('news.db')
-    # Use Row factory to access columns by name
-    conn.row_factory = sqlite3.Row 
-    cursor = conn.cursor()
-
-    # Fetch the last 5 articles that have a telegraph_url
-    cursor.execute("""
-        SELECT id, title, original_url, telegraph_url, translated_content 
-        FROM articles 
-        WHERE telegraph_url IS NOT NULL AND translated_content IS NOT NULL
-        ORDER BY id DESC 
-        LIMIT 5
-    """)
-    articles = cursor.fetchall()
-    conn.close()
+    # Fetch the last 5 articles that have a telegraph_url over the shared database connection
+    articles = get_recent_published_articles(5)
 
     if not articles:
-        print("No processed articles found in the database to send for testing.")
-        print("Please make sure at least one article has been fully processed (has a telegraph_url).")
+        logger.info("No processed articles found in the database to send for testing.")
+        logger.info("Please make sure at least one article has been fully processed (has a telegraph_url).")
         return
 
-    print(f"Found {len(articles)} articles. Resending them for moderation...")
+    logger.info("Found %s articles. Resending them for moderation...", len(articles))
 
-    for article in articles:
-        article_id = article['id']
-        title_with_link = article['title'] # In the DB, the title already has the link
-        original_url = article['original_url']
+    async def send_one(article):
+        article_id = article[ID]
+        title_with_link = article[TITLE] # In the DB, the title already has the link
+        original_url = article[URL]
         
         # The description is not stored directly, but we can use the start of the content.
         # Let's generate a mock description.
         short_description = "Це тестова відправка для перевірки публікації."
         
-        print(f"Sending article ID {article_id} ('{title_with_link[:50]}...') for moderation...")
-        try:
-            await send_for_moderation(
-                title=title_with_link,
-                short_description=short_description,
-                original_url=original_url,
-                article_id=article_id
-            )
-            print(f"✅ Article {article_id} sent successfully.")
-        except Exception as e:
-            print(f"❌ Failed to send article {article_id}: {e}")
-        
-        await asyncio.sleep(1) # Sleep a bit to avoid hitting Telegram rate limits
+        async with semaphore:
+            logger.info("Sending article ID %s ('%s...') for moderation...", article_id, title_with_link[:50])
+            for attempt in range(2):
+                try:
+                    await send_for_moderation(
+                        title=title_with_link,
+                        short_description=short_description,
+                        original_url=original_url,
+                        article_id=article_id
+                    )
+                    logger.info("✅ Article %s sent successfully.", article_id)
+                    return
+                except RetryAfter as e:
+                    # Telegram tells us exactly how long to back off; retry once after that
+                    if attempt:
+                        logger.error("❌ Failed to send article %s: %s", article_id, e)
+                        return
+                    logger.warning("⏳ Rate limited while sending article %s, retrying in %ss", article_id, e.retry_after)
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    logger.error("❌ Failed to send article %s: %s", article_id, e)
+                    return
+
+    # Sends overlap, bounded well below Telegram's rate limits
+    semaphore = asyncio.Semaphore(5)
+    await asyncio.gather(*(send_one(article) for article in articles))
+
+    logger.info("Done sending test articles for moderation.")
+    logger.info("Check your moderation channel.")
 
-    print("\nDone sending test articles for moderation.")
-    print("Check your moderation channel.")
-    
-    # We need to stop the application gracefully
-    await application.shutdown()
+async def main():
+    """Runs resend_articles with an initialized bot application."""
+    logger.info("Initializing Telegram bot application for the test sender...")
+    # Initialize the telegram bot application, required for send_for_moderation
+    application = get_application()
+    await application.initialize()
+    try:
+        await resend_articles()
+    finally:
+        # We need to stop the application gracefully, even if sending failed
+        await application.shutdown()
 
 
 if __name__ == "__main__":
     # Ensure you have a .env file with your bot token and channel IDs
-    print("--- Starting Test Sender ---")
-    asyncio.run(main())
-    print("--- Test Sender Finished ---")
+    setup_logging()
+    logger.info("--- Starting Test Sender ---")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    logger.info("--- Test Sender Finished ---")